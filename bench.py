@@ -0,0 +1,182 @@
+# Star Trader: benchmarks
+# Times the hot paths and whole headless games with fixed seeds.
+#   python bench.py                      run and print the rates
+#   python bench.py --save base.json     also save them as a baseline
+#   python bench.py --compare base.json  flag rates below the baseline
+
+from __future__ import division
+import sys
+import json
+import time
+import argparse
+import platform
+import trader
+
+SEED = 2070
+REPEAT = 5
+THRESHOLD = 0.1 # slowdown that counts as a regression
+
+class Sink(trader.Console):
+  # formats everything and throws it away
+
+  def write(self, text):
+    pass
+
+def make_game(seed, **options):
+  g = trader.make_game(seed)
+  g.io = Sink()
+  trader.auto_setup(g, **options)
+  return g
+
+def running_game(seed):
+  g = make_game(seed)
+  strategies = [trader.Strategy() for p in range(g.number_of_players)]
+  g.end_year = sys.maxsize
+  trader.auto_start(g, strategies)
+  return g, strategies
+
+# EVERY BENCHMARK TAKES A SEED AND RETURNS (RUN, OPS PER RUN, UNIT)
+
+def bench_update_prices(seed):
+  g = make_game(seed)
+
+  def run():
+    for i in range(100):
+      for star in g.stars:
+        trader.update_prices(g, star)
+
+  return run, 100 * len(g.stars), "ops"
+
+def bench_landing(seed):
+  # every landing is followed by the departure that keeps the heap full
+  g, strategies = running_game(seed)
+
+  def run():
+    for i in range(1000):
+      trader.landing(g)
+      trader.auto_eta(g, strategies[g.ship.player_index])
+
+  return run, 1000, "ops"
+
+def stars_bench(number_of_stars, max_distance):
+  # a galaxy that does not fit counts too, it is the slowest case
+  def bench(seed):
+    def run():
+      for i in range(50):
+        g = trader.make_game(seed + i)
+        g.max_distance = max_distance
+        g.stars = trader.make_objects(g, trader.make_star, number_of_stars)
+        try:
+          trader.make_stars(g)
+        except ValueError:
+          pass
+
+    return run, 50, "ops"
+
+  return bench
+
+def bench_star_map(seed):
+  g = make_game(seed)
+
+  def run():
+    for i in range(100):
+      g.map_text = None
+      trader.star_map(g)
+
+  return run, 100, "ops"
+
+def bench_report(seed):
+  g = make_game(seed)
+
+  def run():
+    for i in range(100):
+      trader.report(g)
+
+  return run, 100, "ops"
+
+def games_bench(length, n):
+  def bench(seed):
+    def run():
+      for i in range(n):
+        g = make_game(seed + i, length=length)
+        trader.simulate(g,
+          [trader.Strategy() for p in range(g.number_of_players)])
+
+    return run, n, "games"
+
+  return bench
+
+BENCHMARKS = [
+  ("update_prices", bench_update_prices),
+  ("landing", bench_landing),
+  ("make_stars", stars_bench(13, 15)),
+  ("make_stars_dense", stars_bench(13, 25)),
+  ("star_map", bench_star_map),
+  ("report", bench_report),
+  ("game_5_years", games_bench(5, 20)),
+  ("game_50_years", games_bench(50, 2)),
+  ("game_500_years", games_bench(500, 1))
+]
+
+def measure(bench, seed=SEED, repeat=REPEAT):
+  run, ops, unit = bench(seed)
+  best = float("inf")
+  for i in range(repeat):
+    t = time.perf_counter()
+    run()
+    best = min(best, time.perf_counter() - t)
+  return ops / best, unit
+
+def run_benchmarks(names=None, seed=SEED, repeat=REPEAT):
+  results = {}
+  for name, bench in BENCHMARKS:
+    if names is None or name in names:
+      rate, unit = measure(bench, seed, repeat)
+      results[name] = {"rate": rate, "unit": unit + "/s"}
+  return results
+
+def regressions(results, baseline, threshold=THRESHOLD):
+  slow = {}
+  for name, result in results.items():
+    if name in baseline:
+      ratio = result["rate"] / baseline[name]["rate"]
+      if ratio < 1 - threshold:
+        slow[name] = ratio
+  return slow
+
+def save_baseline(results, path):
+  with open(path, "w") as f:
+    json.dump({"python": platform.python_version(), "seed": SEED,
+      "benchmarks": results}, f, indent=2, sort_keys=True)
+
+def load_baseline(path):
+  with open(path) as f:
+    return json.load(f)["benchmarks"]
+
+def main():
+  parser = argparse.ArgumentParser(description="Star Trader benchmarks")
+  parser.add_argument("names", nargs="*", help="benchmarks to run")
+  parser.add_argument("--save", help="save the rates as a JSON baseline")
+  parser.add_argument("--compare", help="JSON baseline to compare with")
+  parser.add_argument("--threshold", type=float, default=THRESHOLD)
+  parser.add_argument("--repeat", type=int, default=REPEAT)
+  args = parser.parse_args()
+  results = run_benchmarks(args.names or None, repeat=args.repeat)
+  baseline = load_baseline(args.compare) if args.compare else {}
+  slow = regressions(results, baseline, args.threshold)
+  for name, bench in BENCHMARKS:
+    if name in results:
+      line = "%-18s %12.1f %s" % (name, results[name]["rate"],
+        results[name]["unit"])
+      if name in baseline:
+        line += "  %+6.1f%%" % (100 * (results[name]["rate"] /
+          baseline[name]["rate"] - 1))
+      if name in slow:
+        line += "  REGRESSION"
+      print(line)
+  if args.save:
+    save_baseline(results, args.save)
+  return 1 if slow else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,172 @@
+# Star Trader: parity checks
+# Each fast path against the plain code it stands in for: a check plays
+# or sets up the same games both ways and raises AssertionError at the
+# first difference
+#   python checks.py [NAME ...]   runs the named checks, or all of them
+
+from __future__ import division
+import os
+import sys
+import copy
+import random
+import tempfile
+import trader
+import montecarlo
+import galaxies
+
+def expect(ok, text, *args):
+  if not ok:
+    raise AssertionError(text % args if args else text)
+
+def played(seed, players=2, length=5):
+  g = trader.make_game(seed)
+  trader.auto_setup(g, players, length=length)
+  trader.simulate(g, [trader.Strategy() for p in range(players)])
+  return g
+
+# *** ECONOMY ***
+# economy.update_prices() GIVES THE NUMBERS OF update_prices() AND, WITH
+# sign_prices(), OF update_stars(), FOR STARS OF EVERY CLASS WITH ANY
+# GOODS AND ANY TIME SINCE THEIR LAST UPDATE
+
+def check_economy(seeds=50):
+  import economy # needs NumPy
+  for seed in range(seeds):
+    rng = random.Random(seed)
+    g = played(seed, 2 + seed % 3, 3 + seed % 8)
+    g.time += rng.randrange(720)
+    for star in g.stars:
+      star.goods = [(rng.random() - 0.5) * 40 for i in range(6)]
+      star.time = g.time - rng.randrange(720)
+    for signed in (False, True):
+      stars = copy.deepcopy(g.stars)
+      for star in stars:
+        trader.update_prices(g, star)
+        if signed:
+          star.prices = [trader.sgn(star.goods[j]) * star.prices[j]
+            for j in range(6)]
+      e = economy.from_stars(g.stars)
+      economy.update_prices(g, e)
+      if signed:
+        economy.sign_prices(e)
+      vector = copy.deepcopy(g.stars)
+      economy.to_stars(e, vector)
+      for a, b in zip(stars, vector):
+        expect((a.goods, a.prods, a.prices, a.time) ==
+          (b.goods, b.prods, b.prices, b.time),
+          "SEED %d: %s UPDATED DIFFERENTLY", seed, a.name)
+
+# *** MONTE CARLO ***
+# montecarlo.run_games() RETURNS THE SAME RECORDS, IN THE SAME ORDER, FOR
+# ANY NUMBER OF WORKERS AND ANY CHUNK SIZE
+
+def check_montecarlo(games=24, master_seed=2070):
+  serial = montecarlo.run_games(games, master_seed, workers=1)
+  for workers, chunksize in ((2, 1), (3, 5), (4, 16)):
+    pooled = montecarlo.run_games(games, master_seed, workers=workers,
+      chunksize=chunksize)
+    expect(pooled == serial, "%d WORKERS DIFFER FROM ONE", workers)
+
+# *** FAST FORWARD ***
+# fast_forward() LEAVES THE GAME AS STEPPING EVERY STAR AT THE END OF EVERY
+# MONTH DOES, FROM PLAYED GAMES AND FROM GAMES PUSHED TO THE EDGE OF A
+# CLASS CHANGE
+
+def month_by_month(g, days):
+  end = g.time + days
+  while g.time + 30 <= end:
+    g.time += 30
+    for star in list(g.stars):
+      trader.update_prices(g, star)
+      if trader.develop(g, star):
+        trader.discover_star(g)
+  g.time = end
+  for star in g.stars:
+    trader.update_prices(g, star)
+  for ship in g.ships:
+    ship.time += days
+  g.arrivals = [(t + days, tie, voyage, ship)
+    for t, tie, voyage, ship in g.arrivals]
+
+def near_growth(g, seed):
+  for star in g.stars:
+    trader.update_prices(g, star)
+    for i in range(6):
+      if star.prods[i] < -0.01:
+        star.goods[i] = -star.prods[i] * (1.3 if (seed + i) % 4 == 0 else 1)
+    star.level += 3.75 if seed % 2 else 0
+
+def check_fast_forward(seeds=40, days=3600):
+  for seed in range(seeds):
+    for edge in (False, True):
+      a = played(seed, 3, 3 + seed % 5)
+      if edge:
+        near_growth(a, seed)
+      b = trader.game_from_bytes(trader.game_bytes(a))
+      month_by_month(a, days)
+      trader.fast_forward(b, days)
+      expect(a.time == b.time and a.rng.getstate() == b.rng.getstate(),
+        "SEED %d: CLOCK OR RANDOM NUMBERS DIFFER", seed)
+      expect([t for t, tie, voyage, ship in a.arrivals] ==
+        [t for t, tie, voyage, ship in b.arrivals],
+        "SEED %d: ARRIVALS DIFFER", seed)
+      expect(len(a.stars) == len(b.stars), "SEED %d: %d STARS, NOT %d",
+        seed, len(b.stars), len(a.stars))
+      for s, t in zip(a.stars, b.stars):
+        expect((s.name, s.level, s.prices, s.time) ==
+          (t.name, t.level, t.prices, t.time) and
+          max(abs(x - y) for x, y in zip(s.goods, t.goods)) < 1e-9,
+          "SEED %d: %s DIFFERS", seed, s.name)
+
+# *** GALAXY LIBRARY ***
+# A GAME SET UP FROM THE LIBRARY IS THE GAME LIVE GENERATION SETS UP, AND
+# PLAYS THE SAME; A SEED WITH NO ROOM FOR ITS STARS FAILS BOTH WAYS
+
+def setup_error(setup):
+  try:
+    setup()
+  except ValueError as e:
+    return str(e)
+
+def check_galaxies(seeds=60):
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, "library.bin")
+    for stars, spacing, players in ((7, 15, 2), (13, 20, 4), (13, 25, 4)):
+      galaxies.build(path, stars, spacing, 0, seeds)
+      library = galaxies.Library(path)
+      for seed in range(seeds):
+        a, b = trader.make_game(seed), trader.make_game(seed)
+        a.max_distance = b.max_distance = spacing
+        live = setup_error(lambda: trader.auto_setup(a, players,
+          number_of_stars=stars))
+        loaded = setup_error(lambda: library.auto_setup(b, seed,
+          number_of_players=players))
+        expect((live is None) == (loaded is None),
+          "SEED %d: %s AGAINST %s", seed, live, loaded)
+        if live is not None:
+          continue
+        expect(trader.game_bytes(a) == trader.game_bytes(b) and
+          list(a.distances) == list(b.distances) and a.grid == b.grid,
+          "SEED %d: %d STARS SET UP DIFFERENTLY", seed, stars)
+        if seed < 10:
+          for g in (a, b):
+            trader.simulate(g, [trader.Strategy() for p in range(players)])
+          expect(trader.game_bytes(a) == trader.game_bytes(b),
+            "SEED %d: %d STARS PLAY DIFFERENTLY", seed, stars)
+      library.close()
+
+CHECKS = [
+  ("economy", check_economy),
+  ("montecarlo", check_montecarlo),
+  ("fast_forward", check_fast_forward),
+  ("galaxies", check_galaxies)
+]
+
+def main(args):
+  for name, check in CHECKS:
+    if not args or name in args:
+      check()
+      print("%s OK" % name.upper())
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
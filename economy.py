@@ -0,0 +1,61 @@
+# Star Trader: array-backed econometric model
+# All stars are kept in (n_stars, 6) NumPy arrays and updated at once
+
+from __future__ import division
+import numpy as np
+import trader
+
+ECONOMIC = np.array(trader.ECONOMIC, dtype=float)
+PRICES = np.array(trader.PRICES, dtype=float)
+
+class Economy:
+  def __init__(self, n):
+    self.goods = np.zeros((n, 6))
+    self.prods = np.zeros((n, 6))
+    self.prices = np.zeros((n, 6))
+    self.level = np.zeros(n)
+    self.time = np.zeros(n, dtype=np.int64)
+
+def from_stars(stars):
+  e = Economy(len(stars))
+  if stars:
+    e.goods[:] = [star.goods for star in stars]
+    e.prods[:] = [star.prods for star in stars]
+    e.prices[:] = [star.prices for star in stars]
+    e.level[:] = [star.level for star in stars]
+    e.time[:] = [star.time for star in stars]
+  return e
+
+def to_stars(e, stars):
+  rows = zip(stars, e.goods.tolist(), e.prods.tolist(),
+    e.prices.astype(int).tolist(), e.level.tolist(), e.time.tolist())
+  for star, goods, prods, prices, level, time in rows:
+    star.goods[:] = goods
+    star.prods[:] = prods
+    star.prices[:] = prices
+    star.level = level
+    star.time = time
+
+# VECTORIZED trader.update_prices FOR EVERY STAR, SAME NUMBERS
+
+def update_prices(g, e):
+  level = (e.level >= trader.UNDERDEVELOPED).astype(int)
+  level += e.level >= trader.DEVELOPED
+  k = ECONOMIC[:, level, 0].T
+  b = ECONOMIC[:, level, 1].T
+  months = ((g.time - e.time) / 30)[:, None]
+  e.prods[:] = k * e.level[:, None] + b
+  e.prods *= 1 + e.level[:, None] / 15
+  active = np.abs(e.prods) > 0.01
+  goods = np.sign(e.prods) * np.minimum(np.abs(e.prods * 12),
+    np.abs(e.goods + months * e.prods))
+  np.copyto(e.goods, goods, where=active)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    prices = PRICES * (1 - np.sign(e.goods) * np.abs(
+      e.goods / (e.prods * g.margin)))
+  prices = 100 * np.rint(prices / 100 + 0.5)
+  e.prices[:] = np.where(active, prices, 0)
+  e.time[:] = g.time
+
+def sign_prices(e):
+  e.prices *= np.sign(e.goods)
@@ -0,0 +1,246 @@
+# Star Trader: training environment
+# reset()/step() over the headless engine: the agent captains every ship
+# of the first player, the other players follow their strategies.
+# Observations and actions are NumPy arrays of fixed shape
+
+from __future__ import division
+import random
+from collections import namedtuple
+import numpy as np
+import trader
+import economy
+
+MAX_STARS = len(trader.STAR_NAMES)
+
+# AN ACTION IS ACTION_SIZE NUMBERS: THE DESTINATION STAR, THEN PER GOOD THE
+# UNITS TO SELL, THE BID FOR THEM AS A MULTIPLE OF THE STAR'S OFFER, THE
+# UNITS TO BUY AND THEIR BID.  THE ENGINE CLAMPS UNITS AND BIDS TO WHAT
+# THE RULES ALLOW; A DESTINATION IS TAKEN MODULO THE NUMBER OF STARS AND
+# THE SHIP'S OWN STAR MEANS THE NEXT ONE
+
+DESTINATION = 0
+SELL_UNITS = slice(1, 7)
+SELL_BID = slice(7, 13)
+BUY_UNITS = slice(13, 19)
+BUY_BID = slice(19, 25)
+ACTION_SIZE = 25
+
+# THE STAR ARRAYS HAVE ONE ROW PER STAR THE GAME CAN HAVE, THE REST ARE 0
+
+def observation_shapes(max_stars=MAX_STARS):
+  return {
+    "prices": (max_stars, 6),
+    "goods": (max_stars, 6),
+    "levels": (max_stars,),
+    "stars": (),
+    "star": (),
+    "cargo": (6,),
+    "weight": (),
+    "sum": (),
+    "bank": (),
+    "time": ()
+  }
+
+OBSERVATION = observation_shapes()
+
+def make_observation(n=None, max_stars=MAX_STARS):
+  batch = () if n is None else (n,)
+  return dict((k, np.zeros(batch + shape))
+    for k, shape in observation_shapes(max_stars).items())
+
+def default_action():
+  action = np.zeros(ACTION_SIZE)
+  action[SELL_BID] = 1
+  action[BUY_BID] = 1
+  return action
+
+def observe(g, obs):
+  n = len(g.stars)
+  for i, star in enumerate(g.stars):
+    obs["prices"][i] = star.prices
+    obs["goods"][i] = star.goods
+    obs["levels"][i] = star.level
+  obs["prices"][n:] = 0
+  obs["goods"][n:] = 0
+  obs["levels"][n:] = 0
+  obs["stars"][...] = n
+  obs["star"][...] = g.ship.star.index
+  obs["cargo"][:] = g.ship.goods
+  obs["weight"][...] = g.ship.weight
+  obs["sum"][...] = g.ship.sum
+  obs["bank"][...] = g.accounts[g.ship.player_index].sum
+  obs["time"][...] = g.time
+  return obs
+
+class Captain(trader.Strategy):
+  # plays the agent's action; it banks like the default captain
+
+  def __init__(self):
+    self.action = None
+
+  def destination(self, g):
+    if self.action is None:
+      return trader.Strategy.destination(self, g)
+    index = int(self.action[DESTINATION]) % len(g.stars)
+    if index == g.ship.star.index:
+      return trader.Strategy.destination(self, g)
+    return index
+
+  def sell_units(self, g, index, wanted):
+    return int(self.action[SELL_UNITS][index])
+
+  def sale_price(self, g, index, units, r, offer):
+    return int(offer * self.action[SELL_BID][index])
+
+  def buy_units(self, g, index, available):
+    return int(self.action[BUY_UNITS][index])
+
+  def purchase_price(self, g, index, units, r, offer):
+    return int(offer * self.action[BUY_BID][index])
+
+class TraderEnv:
+  # one game; every step is one landing of an agent ship, the reward is
+  # the change of the agent's total assets.  The first voyages tour the
+  # stars in order, as the default captain does.  Observations have
+  # max_stars rows, by default enough for the classic galaxy or the
+  # number_of_stars option, whichever is larger
+
+  def __init__(self, opponent=trader.Strategy, max_stars=None, **options):
+    self.opponent = opponent
+    self.options = options
+    self.max_stars = max_stars or max(MAX_STARS,
+      options.get("number_of_stars") or 0)
+    self.seeds = random.Random()
+    self.g = None
+    self.done = True
+
+  def reset(self, seed=None, obs=None):
+    if seed is not None:
+      self.seeds.seed(seed)
+    g = self.g = trader.make_game(self.seeds.getrandbits(64))
+    trader.auto_setup(g, **self.options)
+    if g.max_stars > self.max_stars:
+      raise ValueError("THE GAME CAN HAVE %d STARS, THE OBSERVATIONS %d" % (
+        g.max_stars, self.max_stars))
+    self.captain = Captain()
+    self.strategies = [self.captain] + [self.opponent()
+      for p in range(1, g.number_of_players)]
+    trader.auto_start(g, self.strategies)
+    self.total = trader.standings(g, 0)[3]
+    self.done = not self.advance()
+    return observe(g, self.observation() if obs is None else obs)
+
+  def observation(self):
+    return make_observation(max_stars=self.max_stars)
+
+  def advance(self):
+    g = self.g
+    while trader.auto_landing(g):
+      if g.ship.player_index == 0:
+        return True
+      trader.auto_turn(g, self.strategies[g.ship.player_index])
+    return False
+
+  def step(self, action, obs=None):
+    if self.done:
+      raise ValueError("THE GAME IS OVER, CALL reset()")
+    g = self.g
+    self.captain.action = action
+    trader.auto_turn(g, self.captain)
+    self.done = not self.advance()
+    total = trader.standings(g, 0)[3]
+    reward = total - self.total
+    self.total = total
+    obs = observe(g, self.observation() if obs is None else obs)
+    return obs, reward, self.done, {"year": trader.year_of(g.time)}
+
+# *** BATCHED LANDINGS ***
+# THE PRICE UPDATES OF MANY GAMES IN ONE economy.update_prices() CALL:
+# EACH ROW IS A STAR WITH THE CLOCK AND MARGIN OF ITS OWN GAME
+
+Clock = namedtuple("Clock", "time margin")
+
+def forecast(games, stars):
+  if not stars:
+    return None
+  e = economy.from_stars(stars)
+  economy.update_prices(Clock(np.array([g.time for g in games]),
+    np.array([[g.margin] for g in games], dtype=float)), e)
+  return e
+
+def update_stars(games):
+  # trader.update_stars() for every game
+  stars = [star for g in games for star in g.stars]
+  e = forecast([g for g in games for star in g.stars], stars)
+  if e is not None:
+    economy.sign_prices(e)
+    economy.to_stars(e, stars)
+  for g in games:
+    for account in g.accounts:
+      trader.update_account(g, account)
+
+def land(envs):
+  # trader.auto_landing() for every game, returns the games still running
+  years = []
+  for env in envs:
+    trader.next_ship(env.g)
+    if trader.new_year(env.g):
+      years.append(env.g)
+  update_stars(years)
+  landed = []
+  for env in envs:
+    g = env.g
+    if trader.year_of(g.time) >= g.end_year:
+      env.done = True
+    else:
+      g.time = g.ship.time
+      landed.append(env)
+  stars = [env.g.ship.star for env in landed]
+  e = forecast([env.g for env in landed], stars)
+  if e is not None:
+    economy.to_stars(e, stars)
+  for env in landed:
+    env.g.io.landed(env.g)
+  return landed
+
+class VectorEnv:
+  # n games stepped in lockstep with (n, ACTION_SIZE) actions; the
+  # observations, rewards and done flags are preallocated arrays that
+  # every step overwrites.  The games land their ships together, so each
+  # landing updates the prices of all of them at once.  A finished game
+  # starts again at once, and its done flag is set for that step
+
+  def __init__(self, n, opponent=trader.Strategy, max_stars=None, **options):
+    self.envs = [TraderEnv(opponent, max_stars, **options) for i in range(n)]
+    self.obs = make_observation(n, self.envs[0].max_stars)
+    self.views = [dict((k, v[i, ...]) for k, v in self.obs.items())
+      for i in range(n)]
+    self.rewards = np.zeros(n)
+    self.dones = np.zeros(n, dtype=bool)
+
+  def reset(self, seed=None):
+    seeds = random.Random(seed)
+    for env, view in zip(self.envs, self.views):
+      env.reset(seeds.getrandbits(64), view)
+    self.dones[:] = False
+    return self.obs
+
+  def step(self, actions):
+    actions = np.asarray(actions, dtype=float)
+    for env, action in zip(self.envs, actions):
+      env.captain.action = action
+      trader.auto_turn(env.g, env.captain)
+    envs = self.envs
+    while envs:
+      envs = [env for env in land(envs) if env.g.ship.player_index != 0]
+      for env in envs:
+        trader.auto_turn(env.g, env.strategies[env.g.ship.player_index])
+    for i, env in enumerate(self.envs):
+      total = trader.standings(env.g, 0)[3]
+      self.rewards[i] = total - env.total
+      env.total = total
+      observe(env.g, self.views[i])
+      self.dones[i] = env.done
+      if env.done:
+        env.reset(obs=self.views[i])
+    return self.obs, self.rewards, self.dones, {}
@@ -0,0 +1,182 @@
+# Star Trader: galaxy library
+# Galaxies generated ahead of time for one star count and spacing over a
+# range of seeds, in a file of fixed-size records that is memory-mapped
+# and read by seed in O(1).  A loaded galaxy leaves the game exactly as
+# make_stars() would have, random number generator included
+#   python galaxies.py STARS MAX_DISTANCE FIRST_SEED COUNT PATH
+
+from __future__ import division
+import os
+import sys
+import math
+import mmap
+import struct
+import trader
+
+LIBRARY_MAGIC = b"STRG"
+LIBRARY_VERSION = 2
+
+LIBRARY_HEADER = struct.Struct("<4sHiiddiqq")
+
+# A RECORD: VALID FLAG, HALF-BOARD COUNTER, RNG STATE, (X, Y, LEVEL) PER
+# STAR AND THE NAMES PADDED TO NAME_SIZE BYTES.  A SEED WHOSE STARS DO NOT
+# FIT KEEPS ITS RECORD WITH THE FLAG CLEAR
+
+NAME_SIZE = max(len(name) for name in trader.STAR_NAMES + [
+  trader.star_name(0)])
+
+def record_struct(number_of_stars, name_size):
+  return struct.Struct("<BB%s%dd%ds" % (trader.SAVE_RNG.format[1:],
+    3 * number_of_stars, number_of_stars * name_size))
+
+def generate(number_of_stars, max_distance, seed, size, max_stars):
+  g = trader.make_game(seed)
+  g.max_distance = max_distance
+  g.size = size
+  g.max_stars = max_stars
+  g.stars = trader.make_objects(g, trader.make_star, number_of_stars)
+  try:
+    trader.make_stars(g)
+  except ValueError:
+    return None
+  return g
+
+# STARS ARE SPACED BEFORE THEIR CO-ORDS ARE ROUNDED, WHICH MOVES EACH OF
+# THEM UP TO HALF A LIGHT-YEAR ALONG EACH AXIS
+
+def check(g):
+  names = trader.get_names(g.stars)
+  if len(set(names)) != len(names):
+    raise ValueError("TWO STARS NAMED ALIKE")
+  for i in range(len(g.stars)):
+    for j in range(i):
+      if g.distances[i][j] < g.max_distance - math.sqrt(2):
+        raise ValueError("STARS %s AND %s TOO CLOSE" % (names[i], names[j]))
+
+def pack_galaxy(record, g):
+  version, state, gauss = g.rng.getstate()
+  coords = []
+  for star in g.stars:
+    coords += [star.x, star.y, star.level]
+  names = b"".join(star.name.encode("ascii").ljust(NAME_SIZE, b"\0")
+    for star in g.stars)
+  return record.pack(*[1, g.half, version] + list(state) +
+    [gauss is not None, gauss or 0] + coords + [names])
+
+def unpack_galaxy(record, data, offset, g, name_size):
+  # the stars of a valid record into g, False for a seed with no room
+  values = record.unpack_from(data, offset)
+  if not values[0]:
+    return False
+  g.half = values[1]
+  rng = values[2:630]
+  g.rng.setstate((rng[0], rng[1:626], rng[627] if rng[626] else None))
+  coords = values[630:630 + 3 * len(g.stars)]
+  names = values[-1]
+  for i, star in enumerate(g.stars):
+    star.x, star.y, star.level = [trader.num(v)
+      for v in coords[3 * i:3 * i + 3]]
+    star.name = names[i * name_size:(i + 1) * name_size].rstrip(
+      b"\0").decode("ascii")
+  trader.make_grid(g, len(g.stars))
+  trader.make_distances(g)
+  return True
+
+# ONE SEED AT A TIME: GENERATED, CHECKED, WRITTEN AND READ BACK FROM ITS
+# RECORD, SO A BUILD HOLDS ONE GALAXY HOWEVER MANY SEEDS IT COVERS
+
+def build(path, number_of_stars, max_distance, first_seed, count, size=100,
+  max_stars=len(trader.STAR_NAMES)):
+  max_stars = max(max_stars, number_of_stars) # as auto_setup() does
+  record = record_struct(number_of_stars, NAME_SIZE)
+  temp = path + ".tmp"
+  with open(temp, "wb") as f:
+    f.write(LIBRARY_HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION,
+      number_of_stars, NAME_SIZE, max_distance, size, max_stars, first_seed,
+      count))
+    for seed in range(first_seed, first_seed + count):
+      g = generate(number_of_stars, max_distance, seed, size, max_stars)
+      if g is None:
+        f.write(b"\0" * record.size)
+        continue
+      check(g)
+      data = pack_galaxy(record, g)
+      f.write(data)
+      h = trader.make_game(seed)
+      h.max_distance = max_distance
+      h.size = size
+      h.max_stars = max_stars
+      h.stars = trader.make_objects(h, trader.make_star, number_of_stars)
+      unpack_galaxy(record, data, 0, h, NAME_SIZE)
+      if trader.game_bytes(h) != trader.game_bytes(g):
+        raise ValueError("SEED %d DOES NOT LOAD BACK" % seed)
+  os.replace(temp, path)
+
+class Library(object):
+  def __init__(self, path):
+    with open(path, "rb") as f:
+      self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (magic, version, self.number_of_stars, self.name_size, max_distance,
+      size, self.max_stars, self.first_seed, self.count) = \
+      LIBRARY_HEADER.unpack_from(self.data)
+    if magic != LIBRARY_MAGIC or version != LIBRARY_VERSION:
+      raise ValueError("NOT A STAR TRADER GALAXY LIBRARY (VERSION %d)" %
+        LIBRARY_VERSION)
+    self.max_distance = trader.num(max_distance)
+    self.size = trader.num(size)
+    self.record = record_struct(self.number_of_stars, self.name_size)
+
+  def __len__(self):
+    return self.count
+
+  def __contains__(self, seed):
+    return self.first_seed <= seed < self.first_seed + self.count
+
+  def close(self):
+    self.data.close()
+
+  def offset(self, seed):
+    if seed not in self:
+      raise KeyError("SEED %d IS NOT IN THE LIBRARY" % seed)
+    return LIBRARY_HEADER.size + (seed - self.first_seed) * self.record.size
+
+  def has_room(self, seed):
+    return self.data[self.offset(seed)] != 0
+
+  def no_room(self):
+    return ValueError("NO ROOM FOR %d STARS %s LIGHT-YEARS APART" % (
+      self.number_of_stars, self.max_distance))
+
+  # A DROP-IN FOR make_stars() IN A GAME MADE WITH make_game(seed) AND
+  # SET UP LIKE THE LIBRARY
+
+  def place_stars(self, g, seed):
+    offset = self.offset(seed)
+    for name, value, library in [
+      ("number_of_stars", len(g.stars), self.number_of_stars),
+      ("max_distance", g.max_distance, self.max_distance),
+      ("size", g.size, self.size),
+      ("max_stars", g.max_stars, self.max_stars)]:
+      if value != library:
+        raise ValueError("THE GAME HAS %s %s, THE LIBRARY %s" % (
+          name, value, library))
+    if not unpack_galaxy(self.record, self.data, offset, g, self.name_size):
+      raise self.no_room()
+
+  # SETS UP A GAME MADE WITH make_game(seed): IT TAKES THE LIBRARY'S
+  # SPACING, BOARD AND STAR CAP, AND IS LEFT AS IT WAS IF THE SEED HAS NO
+  # GALAXY
+
+  def auto_setup(self, g, seed, **options):
+    if not self.has_room(seed):
+      raise self.no_room()
+    g.max_distance = self.max_distance
+    g.size = self.size
+    g.max_stars = self.max_stars
+    options["number_of_stars"] = self.number_of_stars
+    trader.auto_setup(g, place_stars=lambda g: self.place_stars(g, seed),
+      **options)
+
+if __name__ == "__main__":
+  number_of_stars, max_distance, first_seed, count = map(int, sys.argv[1:5])
+  build(sys.argv[5], number_of_stars, max_distance, first_seed, count)
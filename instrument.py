@@ -0,0 +1,156 @@
+# Star Trader: per-phase instrumentation
+# install() wraps the phase functions of trader.py to count their calls,
+# wall time and random draws; uninstall() puts the originals back, so a
+# game without a profile runs the plain functions at full speed
+
+from __future__ import division
+import sys
+import json
+import time
+import inspect
+import trader
+
+# A PHASE IS THE TERMINAL FUNCTION AND ITS HEADLESS TWIN.  TIMES AND DRAWS
+# INCLUDE NESTED PHASES (landing INCLUDES THE YEARLY update_prices), A
+# FUNCTION CALLED INSIDE ITS OWN PHASE IS NOT COUNTED AGAIN, AND A PHASE
+# WAITING FOR INPUT IS NOT TIMED
+
+PHASES = [
+  ("landing", ["landing", "auto_landing"]),
+  ("update_prices", ["update_prices"]),
+  ("buy", ["buy", "auto_buy"]),
+  ("sell", ["sell", "auto_sell"]),
+  ("bank_call", ["bank_call", "auto_bank"]),
+  ("next_eta", ["next_eta", "auto_eta"]),
+  ("travel", ["travel", "voyage"]),
+  ("update_class", ["update_class", "develop"]),
+  ("new_star", ["new_star", "discover_star"]),
+  ("name_star", ["name_star"]),
+  ("add_star", ["add_star", "generate_coords"]),
+  ("good_coords", ["good_coords"])
+]
+
+class Phase(object):
+  __slots__ = ("calls", "seconds", "draws", "depth", "start", "start_draws")
+
+  def __init__(self):
+    self.calls = 0
+    self.seconds = 0
+    self.draws = 0
+    self.depth = 0
+
+class Profile(object):
+  def __init__(self):
+    self.phases = dict((name, Phase()) for name, functions in PHASES)
+    self.draws = 0
+    self.saved = {}
+
+  def enter(self, phase):
+    phase.depth += 1
+    if phase.depth == 1:
+      phase.start_draws = self.draws
+      phase.start = time.perf_counter()
+
+  def leave(self, phase):
+    phase.depth -= 1
+    if phase.depth == 0:
+      phase.seconds += time.perf_counter() - phase.start
+      phase.draws += self.draws - phase.start_draws
+
+  def wrap(self, f, phase):
+    def call(*args):
+      if phase.depth == 0:
+        phase.calls += 1
+      self.enter(phase)
+      try:
+        return f(*args)
+      finally:
+        self.leave(phase)
+
+    def resume(*args):
+      # the phase is left at every yield and entered again on resuming
+      if phase.depth == 0:
+        phase.calls += 1
+      game = f(*args)
+      line = None
+      while True:
+        self.enter(phase)
+        try:
+          request = game.send(line)
+        except StopIteration as stop:
+          return stop.value
+        finally:
+          self.leave(phase)
+        line = yield request
+
+    return resume if inspect.isgeneratorfunction(f) else call
+
+  def install(self):
+    if self.saved:
+      raise ValueError("PROFILE IS ALREADY INSTALLED")
+    rnd = trader.rnd
+
+    def counted_rnd(g):
+      self.draws += 1
+      return rnd(g)
+
+    self.saved["rnd"] = rnd
+    trader.rnd = counted_rnd
+    for name, functions in PHASES:
+      for function in functions:
+        f = getattr(trader, function)
+        self.saved[function] = f
+        setattr(trader, function, self.wrap(f, self.phases[name]))
+    return self
+
+  def uninstall(self):
+    for function, f in self.saved.items():
+      setattr(trader, function, f)
+    self.saved = {}
+
+  def __enter__(self):
+    return self.install()
+
+  def __exit__(self, *exc):
+    self.uninstall()
+
+  def as_dict(self):
+    return dict((name, {"calls": self.phases[name].calls,
+      "seconds": self.phases[name].seconds,
+      "draws": self.phases[name].draws}) for name, functions in PHASES)
+
+  def to_json(self):
+    return json.dumps(self.as_dict(), indent=2)
+
+  def table(self):
+    lines = ["%-14s %10s %12s %12s %10s" % ("PHASE", "CALLS", "SECONDS",
+      "US/CALL", "DRAWS")]
+    for name, functions in PHASES:
+      phase = self.phases[name]
+      lines.append("%-14s %10d %12.4f %12.2f %10d" % (name, phase.calls,
+        phase.seconds, 1e6 * phase.seconds / max(phase.calls, 1),
+        phase.draws))
+    return "\n".join(lines) + "\n"
+
+# python instrument.py [--json] [GAMES [YEARS]]  PROFILES HEADLESS GAMES
+# python instrument.py --play [SAVEFILE]         PROFILES A TERMINAL GAME
+
+def main(args):
+  as_json = "--json" in args
+  args = [a for a in args if a != "--json"]
+  with Profile() as profile:
+    if args and args[0] == "--play":
+      sys.argv = ["trader.py"] + args[1:]
+      trader.main()
+    else:
+      games = int(args[0]) if args else 10
+      years = int(args[1]) if len(args) > 1 else 5
+      for seed in range(games):
+        g = trader.make_game(seed)
+        trader.auto_setup(g, length=years)
+        trader.simulate(g,
+          [trader.Strategy() for p in range(g.number_of_players)])
+  sys.stderr.write(profile.to_json() + "\n" if as_json else profile.table())
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,47 @@
+# Star Trader: Monte Carlo batch runner
+# Every game gets its own RNG stream derived from one master seed,
+# so the results do not depend on the number of worker processes
+
+from __future__ import division
+import random
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import trader
+
+GameResult = namedtuple("GameResult", "seed totals classes years")
+
+def game_seeds(master_seed, n):
+  rng = random.Random(master_seed)
+  return [rng.getrandbits(64) for i in range(n)]
+
+def play(seed, strategy=trader.Strategy, **options):
+  g = trader.make_game(seed)
+  trader.auto_setup(g, **options)
+  trader.simulate(g, [strategy() for p in range(g.number_of_players)])
+  return GameResult(
+    seed,
+    tuple(trader.standings(g, p)[3] for p in range(g.number_of_players)),
+    tuple(trader.text_level(g, star) for star in g.stars),
+    trader.year_of(g.time) - 2070
+  )
+
+def play_seed(args):
+  seed, strategy, options = args
+  return play(seed, strategy, **options)
+
+def run_games(n, master_seed=0, workers=None, strategy=trader.Strategy,
+  chunksize=16, **options):
+  tasks = [(seed, strategy, options) for seed in game_seeds(master_seed, n)]
+  if workers == 1:
+    return [play_seed(task) for task in tasks]
+  with ProcessPoolExecutor(workers) as pool:
+    return list(pool.map(play_seed, tasks, chunksize=chunksize))
+
+if __name__ == "__main__":
+  import sys
+  n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  results = run_games(n, int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+  best = [0] * len(results[0].totals)
+  for r in results:
+    best[r.totals.index(max(r.totals))] += 1
+  print("%d GAMES, WINS PER PLAYER: %s" % (n, best))
@@ -0,0 +1,100 @@
+# Star Trader: input logs
+# A log holds the game's seed, every line the players typed and a digest
+# of the game after each turn.  A replay feeds the lines back with no
+# terminal and stops at the first turn whose digest differs
+
+from __future__ import division
+import sys
+import random
+import hashlib
+import trader
+
+LOG_HEADER = "STAR TRADER LOG 1"
+
+def digest(g):
+  return hashlib.sha1(trader.game_bytes(g)).hexdigest()
+
+class Recorder(trader.Console):
+  def __init__(self, log):
+    trader.Console.__init__(self)
+    self.log = log
+
+  def readline(self):
+    line = trader.Console.readline(self)
+    if line != "":
+      self.log.write("> %s\n" % line.rstrip("\n"))
+      self.log.flush()
+    return line
+
+  def end_turn(self, g):
+    self.log.write("= %s\n" % digest(g))
+    self.log.flush()
+
+class Replay(trader.Console):
+  def __init__(self, lines, digests):
+    trader.Console.__init__(self, quiet=True)
+    self.lines = lines
+    self.digests = digests
+    self.line = 0
+    self.turn = 0
+
+  def readline(self):
+    if self.line == len(self.lines):
+      raise EOFError("LOG ENDS AT TURN %d" % self.turn)
+    self.line += 1
+    return self.lines[self.line - 1]
+
+  def end_turn(self, g):
+    if self.turn == len(self.digests):
+      raise ValueError("LOG ENDS BEFORE TURN %d" % self.turn)
+    if digest(g) != self.digests[self.turn]:
+      raise ValueError("STATE DIVERGES AT TURN %d" % self.turn)
+    self.turn += 1
+
+def record(path, seed=None):
+  if seed is None:
+    seed = random.SystemRandom().getrandbits(64)
+  with open(path, "w") as log:
+    log.write("%s\nSEED %d\n" % (LOG_HEADER, seed))
+    g = trader.make_game(seed)
+    g.io = Recorder(log)
+    trader.run(g, trader.new_game(g))
+  return g
+
+def read_log(path):
+  with open(path) as log:
+    if log.readline().strip() != LOG_HEADER:
+      raise ValueError("%s IS NOT A STAR TRADER LOG" % path)
+    seed = int(log.readline().split()[1])
+    lines, digests = [], []
+    for line in log:
+      if line.startswith("> "):
+        lines.append(line[2:])
+      elif line.startswith("= "):
+        digests.append(line[2:].strip())
+  return seed, lines, digests
+
+# RETURNS THE GAME AND WHETHER IT RAN TO THE END OF THE LOG;
+# A LOG CUT SHORT (A CRASH REPORT) REPLAYS UP TO ITS LAST LINE
+
+def replay(path):
+  seed, lines, digests = read_log(path)
+  g = trader.make_game(seed)
+  g.io = Replay(lines, digests)
+  try:
+    trader.run(g, trader.new_game(g))
+  except EOFError:
+    return g, False
+  if g.io.turn != len(digests) or g.io.line != len(lines):
+    raise ValueError("GAME OVER AT TURN %d, BEFORE THE LOG ENDS" % g.io.turn)
+  return g, True
+
+if __name__ == "__main__":
+  if len(sys.argv) > 2 and sys.argv[1] == "record":
+    record(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else None)
+  elif len(sys.argv) == 2:
+    g, finished = replay(sys.argv[1])
+    print("%s: %d TURNS OK%s" % (sys.argv[1], g.io.turn,
+      "" if finished else ", LOG CUT SHORT"))
+  else:
+    print("USAGE: replay.py record LOG [SEED] | replay.py LOG")
@@ -0,0 +1,197 @@
+# Star Trader: trade route planner
+# Ranks routes from the ship's star by expected profit per day,
+# using the cached travel days and the econometric model
+
+from __future__ import division
+import trader
+
+def expected_stop(g):
+  # average weeks added by voyage() delays and lateness()
+  delay = g.ship_delay / 2 * 2.5
+  late = (1 - g.ship_delay / 2) * 2.5
+  return 7 * (delay + late)
+
+# EVERY STAR'S MARKET AS THE SHIP WOULD FIND IT ON A DIRECT FLIGHT:
+# (UNITS FOR SALE, UNITS WANTED, PRICES) PER GOOD AND THE GOODS ON SALE
+
+def market(goods, prods, prices):
+  offers = [0] * 6
+  needs = [0] * 6
+  for i in range(6):
+    units = trader.rint(goods[i])
+    if prods[i] > 0 and goods[i] >= 1:
+      offers[i] = units
+    elif units < 0:
+      needs[i] = -2 * units
+  return offers, needs, prices, [i for i in range(6) if offers[i] > 0]
+
+def markets(g):
+  here = g.ship.star.index
+  stop = expected_stop(g)
+  result = []
+  for star in g.stars:
+    if star.index == here:
+      result.append(market(star.goods, star.prods, star.prices))
+    else:
+      t = g.time + g.travel_days[here][star.index] + stop
+      result.append(market(*trader.forecast(g, star, t)))
+  return result
+
+def sale_value(market, cargo):
+  value = 0
+  for i in range(6):
+    value += min(cargo[i], market[1][i]) * market[2][i]
+  return value
+
+def fill_hold(deals, room, money):
+  profit = 0
+  units = [0] * 6
+  for gain, price, i, n in deals:
+    if price > 0:
+      n = min(n, int(money / price))
+    if i < 4:
+      n = min(n, room)
+      room -= n
+    money -= n * price
+    profit += n * gain
+    units[i] = n
+  return profit, units
+
+# GOODS BOUGHT AT x AND SOLD AT y: GREEDY BY GAIN PER UNIT (WHEN THE
+# HOLD IS THE LIMIT) OR PER DOLLAR (WHEN MONEY IS), WHICHEVER IS BETTER
+
+def leg(g, x, y, room, money):
+  deals = []
+  for i in x[3]:
+    n = y[1][i]
+    gain = y[2][i] - x[2][i]
+    if n > 0 and gain > 0:
+      deals.append((gain, x[2][i], i, min(n, x[0][i])))
+  if not deals:
+    return 0, [0] * 6
+  if len(deals) == 1:
+    return fill_hold(deals, room, money)
+  by_unit = fill_hold(sorted(deals, reverse=True), room, money)
+  by_dollar = fill_hold(sorted(deals,
+    key=lambda d: -d[0] / max(d[1], 1)), room, money)
+  return max(by_unit, by_dollar)
+
+# NO LEG CAN EARN MORE THAN THE WIDEST PRICE GAP FOR THE MOST UNITS
+
+def leg_bound(m):
+  bound = 0
+  for i in range(6):
+    sellers = [x[2][i] for x in m if x[0][i] > 0]
+    buyers = [y[2][i] for y in m if y[1][i] > 0]
+    if sellers and buyers and max(buyers) > min(sellers):
+      units = min(max(x[0][i] for x in m), max(y[1][i] for y in m))
+      bound += (max(buyers) - min(sellers)) * units
+  return bound
+
+class Planner:
+  def __init__(self, depth=2):
+    self.depth = depth
+    self.turn = None
+    self.cache = {}
+
+  def state(self, g):
+    ship, star = g.ship, g.ship.star
+    turn = (g.time, g.voyages)
+    if turn != self.turn:
+      self.turn = turn
+      self.cache = {}
+    return (ship.star.index, tuple(ship.goods), ship.sum, ship.weight,
+      tuple(star.goods), tuple(star.prices))
+
+  # RETURNS [(PROFIT PER DAY, ROUTE, PROFIT, DAYS, UNITS TO BUY HERE)],
+  # BEST FIRST; ROUTE IS A TUPLE OF STAR INDEXES WITHOUT THE SHIP'S STAR
+
+  def plan(self, g):
+    key = self.state(g)
+    if key not in self.cache:
+      self.cache[key] = self.search(g)
+    return self.cache[key]
+
+  def search(self, g):
+    ship = g.ship
+    here = ship.star.index
+    n = len(g.stars)
+    stop = expected_stop(g)
+    m = markets(g)
+    room = g.max_weight - ship.weight
+    days = [[d + stop for d in row] for row in g.travel_days]
+    legs = [None] * n
+
+    def leg_row(a):
+      if legs[a] is None:
+        legs[a] = [leg(g, m[a], m[b], g.max_weight, ship.sum)[0]
+          for b in range(n)]
+      return legs[a]
+
+    best_leg = leg_bound(m)
+    min_days = min(days[a][b] for a in range(n) for b in range(n) if a != b)
+    routes = []
+    best = [-float("inf")]
+
+    def extend(route, profit, time, left):
+      rate = profit / time
+      routes.append((rate, route, profit, time))
+      best[0] = max(best[0], rate)
+      if left == 0:
+        return
+      a = route[-1]
+      bound = (profit + left * best_leg) / (time + left * min_days)
+      if bound <= best[0]:
+        return
+      for b in range(n):
+        if b != a:
+          extend(route + (b,), profit + leg_row(a)[b], time + days[a][b],
+            left - 1)
+
+    first = []
+    for b in range(n):
+      if b != here:
+        profit, units = leg(g, m[here], m[b], room, ship.sum)
+        profit += sale_value(m[b], ship.goods)
+        first.append((profit, b, units))
+    units_for = {}
+    for profit, b, units in sorted(first, reverse=True):
+      units_for[b] = units
+      extend((b,), profit, days[here][b], self.depth - 1)
+    routes.sort(key=lambda r: -r[0])
+    return [r + (units_for[r[1][0]],) for r in routes]
+
+def next_hops(g, planner):
+  hops = {}
+  for route in planner.plan(g):
+    hops.setdefault(route[1][0], route)
+  return sorted(hops.values(), key=lambda r: -r[0])
+
+class RouteStrategy(trader.Strategy):
+  # flies the best planned route and haggles with the negotiation oracle
+
+  def __init__(self, depth=2):
+    self.planner = Planner(depth)
+    self.turn = None
+
+  def route(self, g):
+    turn = (g.time, g.voyages, g.ship.star.index)
+    if turn != self.turn:
+      self.turn = turn
+      self.best = self.planner.plan(g)[0]
+    return self.best
+
+  def destination(self, g):
+    return self.route(g)[1][0]
+
+  def sell_units(self, g, index, wanted):
+    return min(2 * wanted, g.ship.goods[index])
+
+  def sale_price(self, g, index, units, r, offer):
+    return trader.best_sale(g, g.ship.star, index, units, r)[0]
+
+  def buy_units(self, g, index, available):
+    return self.route(g)[4][index]
+
+  def purchase_price(self, g, index, units, r, offer):
+    return trader.best_purchase(g, g.ship.star, index, units, r)[0]
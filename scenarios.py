@@ -0,0 +1,54 @@
+# Star Trader: scenario files
+# A scenario is a JSON object of game settings for galaxies far beyond
+# the terminal game's limits, for example
+#   {"number_of_players": 4, "ships_per_player": 100,
+#    "number_of_stars": 5000, "size": 2000, "length": 10}
+# Settings left out keep the make_game() and auto_setup() defaults
+#   python scenarios.py FILE [SEED]   sets up and plays it headless
+
+from __future__ import division
+import sys
+import json
+import time
+import trader
+
+GAME_SETTINGS = ["size", "max_stars", "max_distance", "margin", "ship_delay",
+  "level_inc", "max_weight", "number_of_rounds"]
+SETUP_SETTINGS = ["number_of_players", "ships_per_player", "number_of_stars",
+  "length"]
+
+def load_scenario(path):
+  with open(path) as f:
+    scenario = json.load(f)
+  for name in scenario:
+    if name not in GAME_SETTINGS and name not in SETUP_SETTINGS:
+      raise ValueError("UNKNOWN SETTING %s IN %s" % (name, path))
+  return scenario
+
+# A GALAXY BIGGER THAN STAR_NAMES GETS GENERATED NAMES; auto_setup()
+# RAISES max_stars TO THE NUMBER OF STARS, LEAVING NO ROOM FOR DISCOVERIES
+# UNLESS THE SCENARIO ASKS FOR MORE
+
+def scenario_game(scenario, seed=None):
+  g = trader.make_game(seed)
+  for name in GAME_SETTINGS:
+    if name in scenario:
+      setattr(g, name, scenario[name])
+  trader.auto_setup(g, **dict((name, scenario[name])
+    for name in SETUP_SETTINGS if name in scenario))
+  return g
+
+def main(args):
+  scenario = load_scenario(args[0])
+  t = time.perf_counter()
+  g = scenario_game(scenario, int(args[1]) if len(args) > 1 else None)
+  setup = time.perf_counter() - t
+  t = time.perf_counter()
+  trader.simulate(g, [trader.Strategy() for p in range(g.number_of_players)])
+  print("%d STARS, %d SHIPS: SETUP %.2f S, %d VOYAGES IN %.2f S" % (
+    len(g.stars), len(g.ships), setup, g.voyages, time.perf_counter() - t))
+  for p in range(g.number_of_players):
+    print("PLAYER %d  %12d" % (p + 1, trader.standings(g, p)[3]))
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
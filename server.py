@@ -0,0 +1,57 @@
+# Star Trader: game server
+# Every connection plays its own game; the games are generators that
+# yield for input, so one event loop runs all of them at once
+
+from __future__ import division
+import sys
+import asyncio
+import trader
+
+IDLE_TIMEOUT = 600
+
+class Session(trader.Console):
+  # buffers the game's output until it waits for the next line
+
+  def __init__(self, writer):
+    trader.Console.__init__(self)
+    self.writer = writer
+
+  def flush(self):
+    if self.text:
+      text = "".join(self.text).replace("\n", "\r\n")
+      self.writer.write(text.encode("ascii", "replace"))
+      self.text = []
+
+async def play(reader, writer, seed=None, idle_timeout=IDLE_TIMEOUT):
+  g = trader.make_game(seed)
+  g.io = Session(writer)
+  game = trader.new_game(g)
+  try:
+    next(game)
+    while True:
+      g.io.flush()
+      await writer.drain()
+      line = await asyncio.wait_for(reader.readline(), idle_timeout)
+      if not line:
+        break
+      game.send(line.decode("ascii", "replace"))
+  except StopIteration:
+    pass
+  except asyncio.TimeoutError:
+    trader.say(g, "\n\nIDLE TOO LONG, GOODBYE\n")
+  except ConnectionError:
+    pass
+  finally:
+    game.close()
+    g.io.flush()
+    writer.close()
+
+async def serve(host="127.0.0.1", port=2070, idle_timeout=IDLE_TIMEOUT):
+  server = await asyncio.start_server(
+    lambda r, w: play(r, w, idle_timeout=idle_timeout), host, port)
+  async with server:
+    await server.serve_forever()
+
+if __name__ == "__main__":
+  port = int(sys.argv[1]) if len(sys.argv) > 1 else 2070
+  asyncio.run(serve(port=port))
@@ -0,0 +1,167 @@
+# Star Trader: shared-memory galaxy snapshots
+# A Snapshot puts one game into a multiprocessing.shared_memory block:
+# the saved game, star arrays and the distance tables.  Workers attach
+# a Galaxy by the snapshot's small descriptor and read the arrays in
+# place.  A game rebuilt from it shares only the distance tables, copying
+# a row when it discovers a star; its stars, ships and accounts are read
+# out of the saved game, a few hundred bytes per star
+
+from __future__ import division
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing import util
+import numpy as np
+import trader
+
+Descriptor = namedtuple("Descriptor", "name stars game_size")
+
+# THE BLOCK: SAVED GAME (PADDED TO 8 BYTES), THEN ONE ARRAY PER FIELD
+
+def layout(n, game_size):
+  fields = [
+    ("x", np.float64, (n,)),
+    ("y", np.float64, (n,)),
+    ("level", np.float64, (n,)),
+    ("time", np.int64, (n,)),
+    ("goods", np.float64, (n, 6)),
+    ("prods", np.float64, (n, 6)),
+    ("prices", np.float64, (n, 6)),
+    ("distances", np.float64, (n, n)),
+    ("travel_days", np.int64, (n, n))
+  ]
+  offset = (game_size + 7) // 8 * 8
+  arrays = {}
+  for name, dtype, shape in fields:
+    arrays[name] = (offset, dtype, shape)
+    offset += 8 * int(np.prod(shape))
+  return arrays, max(offset, 1)
+
+def views(buf, n, game_size):
+  arrays, size = layout(n, game_size)
+  return dict((name, np.ndarray(shape, dtype, buf, offset))
+    for name, (offset, dtype, shape) in arrays.items())
+
+class Snapshot(object):
+  # owns the block; close() frees it once the workers are done
+
+  def __init__(self, g):
+    data = trader.game_bytes(g)
+    n = len(g.stars)
+    arrays, size = layout(n, len(data))
+    self.shm = shared_memory.SharedMemory(create=True, size=size)
+    self.shm.buf[:len(data)] = data
+    a = views(self.shm.buf, n, len(data))
+    a["x"][:] = [star.x for star in g.stars]
+    a["y"][:] = [star.y for star in g.stars]
+    a["level"][:] = [star.level for star in g.stars]
+    a["time"][:] = [star.time for star in g.stars]
+    a["goods"][:] = [star.goods for star in g.stars]
+    a["prods"][:] = [star.prods for star in g.stars]
+    a["prices"][:] = [star.prices for star in g.stars]
+    a["distances"][:] = list(g.distances)
+    a["travel_days"][:] = list(g.travel_days)
+    del a
+    self.descriptor = Descriptor(self.shm.name, n, len(data))
+
+  def close(self):
+    self.shm.close()
+    self.shm.unlink()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+class Galaxy(object):
+  # read-only NumPy views of a snapshot: x, y, level, time, goods, prods,
+  # prices, distances, travel_days.  close() releases them, and the games
+  # built by game() can no longer read their distance tables
+
+  def __init__(self, descriptor, shm=None):
+    self.descriptor = descriptor
+    self.attached = shm is None
+    self.shm = shm or shared_memory.SharedMemory(descriptor.name)
+    self.buf = self.shm.buf.toreadonly()
+    self.arrays = views(self.buf, descriptor.stars, descriptor.game_size)
+    for name, array in self.arrays.items():
+      setattr(self, name, array)
+    self.tables = {}
+
+  def rows(self, name, code):
+    # one read-only memoryview per table row, made once for all games
+    if name not in self.tables:
+      offset, dtype, shape = layout(self.descriptor.stars,
+        self.descriptor.game_size)[0][name]
+      n = self.descriptor.stars
+      self.tables[name] = [
+        self.buf[offset + 8 * n * i:offset + 8 * n * (i + 1)].cast(code)
+        for i in range(n)]
+    return self.tables[name]
+
+  def game(self):
+    g = trader.game_from_bytes(self.buf[:self.descriptor.game_size],
+      tables=False)
+    g.distances = trader.Table(g, trader.distance_row,
+      list(self.rows("distances", "d")))
+    g.travel_days = trader.Table(g, trader.days_row,
+      list(self.rows("travel_days", "q")))
+    return g
+
+  def close(self):
+    if self.buf is None:
+      return
+    for rows in self.tables.values():
+      for row in rows:
+        row.release()
+    self.tables = {}
+    for name in self.arrays:
+      setattr(self, name, None)
+    self.arrays = {}
+    self.buf.release()
+    self.buf = None
+    if self.attached:
+      self.shm.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+# *** FAN-OUT ***
+# EVERY WORKER PROCESS ATTACHES THE SNAPSHOT ONCE AND CLOSES IT ON EXIT;
+# A TASK IS task(galaxy, arg) AND ONLY ITS ARGUMENT AND RESULT ARE
+# PICKLED.  THE WORKERS SHARE THE CREATOR'S RESOURCE TRACKER, SO ONLY
+# Snapshot.close() FREES THE BLOCK
+
+worker_galaxy = None
+
+def attach_worker(descriptor):
+  global worker_galaxy
+  worker_galaxy = Galaxy(descriptor)
+  util.Finalize(worker_galaxy, worker_galaxy.close, exitpriority=10)
+
+def run_task(args):
+  task, arg = args
+  return task(worker_galaxy, arg)
+
+def fan_out(g, task, args, workers=None, chunksize=1):
+  with Snapshot(g) as snapshot:
+    with ProcessPoolExecutor(workers, initializer=attach_worker,
+      initargs=(snapshot.descriptor,)) as pool:
+      return list(pool.map(run_task, [(task, arg) for arg in args],
+        chunksize=chunksize))
+
+# A WHAT-IF: THE SNAPSHOT'S GAME PLAYED ON FOR years WITH ITS RANDOM
+# NUMBERS RESEEDED, RETURNS THE PLAYERS' TOTALS
+
+def what_if(galaxy, seed, years=1, strategy=trader.Strategy):
+  g = galaxy.game()
+  g.rng.seed(seed)
+  g.end_year = trader.year_of(g.time) + years
+  strategies = [strategy() for p in range(g.number_of_players)]
+  while trader.auto_landing(g):
+    trader.auto_turn(g, strategies[g.ship.player_index])
+  return [trader.standings(g, p)[3] for p in range(g.number_of_players)]
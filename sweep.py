@@ -0,0 +1,184 @@
+# Star Trader: parameter sweeps
+# Runs headless games for every configuration x seed of a sweep.  Each
+# game's result is appended to a JSON-lines cache keyed by (configuration,
+# seed, engine version), so an interrupted or extended sweep only plays
+# the games that are missing
+
+from __future__ import division
+import os
+import sys
+import json
+import random
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import trader
+
+# KNOBS SET ON THE GAME BEFORE SETUP, AND THE OPTIONS OF auto_setup()
+
+GAME_KNOBS = ["margin", "ship_delay", "level_inc", "max_distance",
+  "max_weight", "number_of_rounds", "size", "max_stars"]
+SETUP_KNOBS = ["number_of_players", "ships_per_player", "number_of_stars",
+  "length"]
+
+def engine_version():
+  # any change to the rules module makes the old results stale
+  with open(trader.__file__, "rb") as f:
+    return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def cell_key(config, seed, version):
+  return "%s %d %s" % (json.dumps(config, sort_keys=True), seed, version)
+
+def grid(knobs):
+  names = sorted(knobs)
+  return [dict(zip(names, values))
+    for values in itertools.product(*[knobs[name] for name in names])]
+
+def sample(knobs, n, seed=0):
+  rng = random.Random(seed)
+  names = sorted(knobs)
+  return [dict((name, rng.choice(knobs[name])) for name in names)
+    for i in range(n)]
+
+def play(config, seed):
+  for name in config:
+    if name not in GAME_KNOBS and name not in SETUP_KNOBS:
+      raise ValueError("UNKNOWN KNOB %s" % name)
+  g = trader.make_game(seed)
+  for name in GAME_KNOBS:
+    if name in config:
+      setattr(g, name, config[name])
+  try:
+    trader.auto_setup(g, **dict((name, config[name])
+      for name in SETUP_KNOBS if name in config))
+  except ValueError as e:
+    return {"error": str(e)}
+  trader.simulate(g, [trader.Strategy() for p in range(g.number_of_players)])
+  totals = [trader.standings(g, p)[3] for p in range(g.number_of_players)]
+  return {
+    "totals": totals,
+    "winner": totals.index(max(totals)),
+    "stars": len(g.stars),
+    "mean_level": sum(star.level for star in g.stars) / len(g.stars),
+    "years": trader.year_of(g.time) - 2070
+  }
+
+def play_cell(args):
+  config, seed = args
+  return play(config, seed)
+
+class Cache(object):
+  def __init__(self, path):
+    self.path = path
+    self.results = {}
+    if os.path.exists(path):
+      with open(path) as f:
+        for line in f:
+          if line.strip():
+            cell = json.loads(line)
+            self.results[cell["key"]] = cell["result"]
+
+  def add(self, config, seed, version, result):
+    key = cell_key(config, seed, version)
+    self.results[key] = result
+    with open(self.path, "a") as f:
+      f.write(json.dumps({"key": key, "config": config, "seed": seed,
+        "version": version, "result": result}, sort_keys=True) + "\n")
+
+def cells(configs, seeds):
+  return [(config, seed) for config in configs for seed in seeds]
+
+def progress(cache, configs, seeds, version=None):
+  version = version or engine_version()
+  done = sum(cell_key(config, seed, version) in cache.results
+    for config, seed in cells(configs, seeds))
+  total = len(configs) * len(seeds)
+  return done, total
+
+def run_sweep(cache, configs, seeds, workers=None, report=None):
+  version = engine_version()
+  missing = [(config, seed) for config, seed in cells(configs, seeds)
+    if cell_key(config, seed, version) not in cache.results]
+  done, total = progress(cache, configs, seeds, version)
+  if report:
+    report(done, total)
+  if workers == 1:
+    results = map(play_cell, missing)
+  else:
+    pool = ProcessPoolExecutor(workers)
+    results = pool.map(play_cell, missing, chunksize=4)
+  try:
+    for (config, seed), result in zip(missing, results):
+      cache.add(config, seed, version, result)
+      done += 1
+      if report:
+        report(done, total)
+  finally:
+    if workers != 1:
+      pool.shutdown(cancel_futures=True)
+  return summary(cache, configs, seeds, version)
+
+# PER CONFIGURATION: GAMES PLAYED, FAILED SETUPS, MEAN AND BEST TOTAL,
+# WINS PER PLAYER, MEAN STARS AND MEAN STAR LEVEL AT THE END
+
+def summary(cache, configs, seeds, version=None):
+  version = version or engine_version()
+  rows = []
+  for config in configs:
+    results = [cache.results.get(cell_key(config, seed, version))
+      for seed in seeds]
+    played = [r for r in results if r and "error" not in r]
+    row = {"config": config, "games": len(played),
+      "errors": sum(1 for r in results if r and "error" in r),
+      "missing": results.count(None)}
+    if played:
+      totals = [t for r in played for t in r["totals"]]
+      wins = [0] * max(len(r["totals"]) for r in played)
+      for r in played:
+        wins[r["winner"]] += 1
+      row.update(mean_total=sum(totals) / len(totals), best_total=max(totals),
+        wins=wins, stars=sum(r["stars"] for r in played) / len(played),
+        mean_level=sum(r["mean_level"] for r in played) / len(played))
+    rows.append(row)
+  return rows
+
+# python sweep.py CACHE KNOB=V1,V2,... [--seeds N] [--sample N] [--status]
+
+def parse_knobs(args):
+  knobs = {}
+  for arg in args:
+    name, values = arg.split("=")
+    knobs[name] = [json.loads(v) for v in values.split(",")]
+  return knobs
+
+def print_progress(done, total):
+  sys.stderr.write("\r%d/%d GAMES" % (done, total))
+  if done == total:
+    sys.stderr.write("\n")
+
+def main(args):
+  options = dict(seeds="10", sample=None)
+  status = "--status" in args
+  rest = []
+  args = [a for a in args if a != "--status"]
+  while args:
+    arg = args.pop(0)
+    if arg.startswith("--"):
+      options[arg[2:]] = args.pop(0)
+    else:
+      rest.append(arg)
+  cache = Cache(rest[0])
+  knobs = parse_knobs(rest[1:])
+  if options["sample"]:
+    configs = sample(knobs, int(options["sample"]))
+  else:
+    configs = grid(knobs)
+  seeds = range(int(options["seeds"]))
+  if status:
+    print("%d/%d GAMES DONE" % progress(cache, configs, seeds))
+    return
+  for row in run_sweep(cache, configs, seeds, report=print_progress):
+    print(json.dumps(row, sort_keys=True))
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
@@ -0,0 +1,135 @@
+# Star Trader: economy time series
+# A console that also records every star at each landing and every
+# closed deal into fixed-size column buffers.  A full buffer is written
+# out as a NumPy .npz shard and reused, so memory stays flat however
+# long the game runs
+
+from __future__ import division
+import os
+import glob
+import numpy as np
+import trader
+
+SHARD_ROWS = 1 << 16
+
+# EACH SHARD HOLDS THESE COLUMNS, ONE ROW PER STAR PER LANDING OR PER DEAL.
+# UNITS ARE POSITIVE WHEN THE SHIP BUYS, PRICE IS WHAT THE SHIP PAID
+# (NEGATIVE WHEN IT SOLD), round COUNTS FROM 0
+
+STAR_COLUMNS = [
+  ("landing", np.int64, ()),
+  ("time", np.int64, ()),
+  ("star", np.int32, ()),
+  ("level", np.float64, ()),
+  ("goods", np.float64, (6,)),
+  ("prods", np.float64, (6,)),
+  ("prices", np.float64, (6,))
+]
+
+TRADE_COLUMNS = [
+  ("landing", np.int64, ()),
+  ("time", np.int64, ()),
+  ("ship", np.int32, ()),
+  ("star", np.int32, ()),
+  ("good", np.int8, ()),
+  ("units", np.int32, ()),
+  ("price", np.float64, ()),
+  ("round", np.int8, ())
+]
+
+class Shards(object):
+  # column buffers of a fixed number of rows and the shards written so far
+
+  def __init__(self, pattern, columns, rows=SHARD_ROWS):
+    self.pattern = pattern
+    self.columns = dict((name, np.zeros((rows,) + shape, dtype))
+      for name, dtype, shape in columns)
+    self.rows = rows
+    self.used = 0
+    self.shards = 0
+
+  def reserve(self, n):
+    if n > self.rows:
+      raise ValueError("%d ROWS DO NOT FIT IN A SHARD OF %d" % (n, self.rows))
+    if self.used + n > self.rows:
+      self.write()
+    start = self.used
+    self.used += n
+    return start
+
+  def write(self):
+    if self.used > 0:
+      np.savez(self.pattern % self.shards,
+        **dict((k, v[:self.used]) for k, v in self.columns.items()))
+      self.shards += 1
+      self.used = 0
+
+class Series(trader.Console):
+  def __init__(self, directory, rows=SHARD_ROWS, quiet=False):
+    trader.Console.__init__(self, quiet)
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+    self.stars = Shards(os.path.join(directory, "stars-%05d.npz"),
+      STAR_COLUMNS, rows)
+    self.trades = Shards(os.path.join(directory, "trades-%05d.npz"),
+      TRADE_COLUMNS, rows)
+    # level, goods, prods and prices are views of one block, filled
+    # with one assignment per landing
+    self.block = np.zeros((rows, 19))
+    self.stars.columns.update(level=self.block[:, 0],
+      goods=self.block[:, 1:7], prods=self.block[:, 7:13],
+      prices=self.block[:, 13:])
+    self.landings = 0
+    self.ship_index = {}
+
+  def landed(self, g):
+    # a galaxy of more stars than a shard has rows spans several shards
+    c = self.stars.columns
+    for i in range(0, len(g.stars), self.stars.rows):
+      stars = g.stars[i:i + self.stars.rows]
+      n = len(stars)
+      k = self.stars.reserve(n)
+      c["landing"][k:k + n] = self.landings
+      c["time"][k:k + n] = g.time
+      c["star"][k:k + n] = range(i, i + n)
+      self.block[k:k + n] = [[star.level] + star.goods + star.prods +
+        star.prices for star in stars]
+    self.landings += 1
+
+  def traded(self, g, index, units, price, r):
+    if len(self.ship_index) != len(g.ships):
+      self.ship_index = dict((id(ship), i) for i, ship in enumerate(g.ships))
+    k = self.trades.reserve(1)
+    c = self.trades.columns
+    c["landing"][k] = self.landings - 1
+    c["time"][k] = g.time
+    c["ship"][k] = self.ship_index[id(g.ship)]
+    c["star"][k] = g.ship.star.index
+    c["good"][k] = index
+    c["units"][k] = units
+    c["price"][k] = price
+    c["round"][k] = r
+
+  def close(self):
+    self.stars.write()
+    self.trades.write()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+# READS ALL SHARDS OF ONE KIND ("stars" OR "trades") BACK AS ONE ARRAY PER
+# COLUMN; FOR LONG RUNS, ITERATE OVER THE SHARDS INSTEAD
+
+def shards(directory, kind):
+  for path in sorted(glob.glob(os.path.join(directory, kind + "-*.npz"))):
+    with np.load(path) as shard:
+      yield dict((k, shard[k]) for k in shard.files)
+
+def load(directory, kind):
+  parts = list(shards(directory, kind))
+  if not parts:
+    return {}
+  return dict((k, np.concatenate([p[k] for p in parts])) for k in parts[0])
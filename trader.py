@@ -4,28 +4,79 @@
 from __future__ import division
 import sys
 import math
-from random import random as rnd
+import heapq
+import os
+import struct
+import random
 
-def say(text):
-  sys.stdout.write(str(text))
-  sys.stdout.flush()
+# ALL TEXT GOES THROUGH THE GAME'S CONSOLE.  say() FORMATS ITS
+# ARGUMENTS ONLY WHEN THE CONSOLE IS NOT QUIET, AND THE CONSOLE KEEPS
+# THE TEXT UNTIL THE NEXT INPUT IS READ, SO A TURN IS ONE WRITE
 
-def get_text():
+class Console(object):
+  # the terminal, looked up on every call so sys.stdin/stdout can change
+
+  def __init__(self, quiet=False):
+    self.quiet = quiet
+    self.text = []
+
+  def write(self, text):
+    self.text.append(text)
+
+  def flush(self):
+    if self.text:
+      sys.stdout.write("".join(self.text))
+      sys.stdout.flush()
+      self.text = []
+
+  def readline(self):
+    self.flush()
+    return sys.stdin.readline()
+
+  def end_turn(self, g):
+    pass
+
+  # hooks for recorders: a ship landed and its star's prices are updated,
+  # a deal was closed in bidding round r
+
+  def landed(self, g):
+    pass
+
+  def traded(self, g, index, units, price, r):
+    pass
+
+def say(g, text, *args):
+  if not g.io.quiet:
+    g.io.write(text % args if args else str(text))
+
+# THE GAME FUNCTIONS THAT READ INPUT ARE GENERATORS: THEY YIELD WHEN THEY
+# NEED A LINE.  run() FEEDS THEM FROM THE GAME'S CONSOLE, OTHER DRIVERS
+# (LIKE THE SERVER) SEND LINES AS THEY ARRIVE
+
+def get_text(g):
   while True:
-    s = sys.stdin.readline().upper().strip()
+    s = (yield).upper().strip()
     if s != "":
       return s
 
-def get_int():
+def run(g, game):
+  try:
+    next(game)
+    while True:
+      game.send(g.io.readline())
+  except StopIteration as stop:
+    return stop.value
+
+def get_int(g):
   try:
-    return int(get_text())
+    return int((yield from get_text(g)))
   except ValueError:
     return None
 
-def ask(text, checked):
+def ask(g, text, checked):
   while True:
-    say(text)
-    n = get_int()
+    say(g, text)
+    n = yield from get_int(g)
     if n != None and checked(n):
       return n
 
@@ -41,6 +92,21 @@ def sgn(x):
 
 rint = lambda x: int(round(x))
 
+rnd = lambda g: g.rng.random()
+
+# THE CLOCK COUNTS DAYS, A YEAR IS 12 MONTHS OF 30 DAYS
+
+def make_time(year, day=1):
+  return 360 * year + day - 1
+
+def year_of(t):
+  return t // 360
+
+def date(t):
+  year, day = divmod(t, 360)
+  m = day // 30
+  return "%s %d, %d" % (MONTHS[m], day - 30 * m + 1, year)
+
 INTRO = """
      THE DATE IS JAN 1, 2070 AND INTERSTELLAR FLIGHT
 HAS EXISTED FOR 70 YEARS.  THERE ARE SEVERAL STAR
@@ -131,13 +197,39 @@ ECONOMIC = [
   [[0.1, 0.5], [-0.1, 1.5], [0, -0.5]]
 ]
 
-class Record:
+# GAME OBJECTS HAVE A FIXED SET OF FIELDS AND NO __dict__, WHICH KEEPS
+# THEM SMALL AND QUICK TO ALLOCATE, COPY AND PICKLE.  A DEFAULT 2-PLAYER
+# GAME (4 SHIPS, 7 STARS) TAKES ABOUT 12 KB, 2.5 KB OF IT THE RNG STATE
+
+class Record(object):
+  __slots__ = ()
+
   def __init__(self, **kwargs):
     for kw in kwargs:
       setattr(self, kw, kwargs[kw])
 
-def make_game():
-  return Record(
+class Game(Record):
+  __slots__ = ("io", "rng", "ship_speed", "max_distance", "ship_delay",
+    "number_of_rounds", "max_weight", "margin", "level_inc", "time",
+    "end_year", "number_of_players", "half", "size", "max_stars", "grid",
+    "distances", "travel_days", "map_text", "voyages", "arrivals", "ship",
+    "ships", "stars", "accounts")
+
+class Ship(Record):
+  __slots__ = ("goods", "weight", "time", "sum", "star", "status",
+    "player_index", "name")
+
+class Star(Record):
+  __slots__ = ("goods", "prices", "prods", "x", "y", "level", "index",
+    "time", "name")
+
+class Account(Record):
+  __slots__ = ("sum", "time", "on_ships", "cargoes")
+
+def make_game(seed=None):
+  return Game(
+    io = Console(),
+    rng = random.Random(seed),
     ship_speed = 2 / 7,
     max_distance = 15, # between stars
     ship_delay = 0.1,
@@ -145,11 +237,18 @@ def make_game():
     max_weight = 30, # ship weight
     margin = 36,
     level_inc = 1.25, # star level increment
-    day = 1,
-    year = 2070,
+    time = make_time(2070),
     end_year = 5,
     number_of_players = 2,
     half = 1,
+    size = 100, # light-years across
+    max_stars = len(STAR_NAMES), # discoveries stop here
+    grid = {}, # (column, row) -> star indexes
+    distances = [], # between stars, in light-years
+    travel_days = [], # the same at ship_speed
+    map_text = None,
+    voyages = 0,
+    arrivals = [], # heap of (time, tie, voyage, ship)
     ship = None,
     ships = [],
     stars = [],
@@ -157,11 +256,10 @@ def make_game():
   )
 
 def make_ship(g):
-  return Record(
+  return Ship(
     goods = [0, 0, 15, 10, 10, 0],
     weight = 25,
-    day = g.day,
-    year = g.year,
+    time = g.time,
     sum = 5000,
     star = None,
     status = 0,
@@ -170,53 +268,96 @@ def make_ship(g):
   )
 
 def make_star(g):
-  return Record(
+  return Star(
     goods = [0, 0, 0, 0, 0, 0],
     prices = [0, 0, 0, 0, 0, 0],
     prods = [0, 0, 0, 0, 0, 0], # star's productivity/month
     x = 0,
     y = 0,
     level = COSMOPOLITAN,
-    day = 270,
-    year = g.year - 1,
+    index = 0, # in g.stars
+    time = make_time(year_of(g.time) - 1, 270),
     name = STAR_NAMES[0]
   )
 
 def make_account(g):
-  return Record(
+  return Account(
     sum = 0,
-    day = g.day,
-    year = g.year
+    time = g.time,
+    on_ships = 0,
+    cargoes = 0
   )
 
 def make_objects(g, obj, n):
   return [obj(g) for i in range(n)]
 
+def ask_stars(g):
+  number_of_stars = yield from ask(g,
+    "HOW MANY STAR SYSTEMS (FROM 4 TO 13 STARS) ", in_range(4, 13))
+  g.stars = make_objects(g, make_star, number_of_stars)
+
+def ask_spacing(g):
+  say(g, "WHAT'S THE MINIMUM DISTANCE BETWEEN STARS")
+  g.max_distance = yield from ask(g, "(MIN SPACING 10, MAX 25, USUALLY 15) ",
+    in_range(10, 25))
+
 def own_game(g):
-  g.number_of_players = ask("HOW MANY PLAYERS (2,3,4, ... ,12 CAN PLAY) ",
-    in_range(2, 12))
-  n = ask("HOW MANY SHIPS PER PLAYER (MAX 12) ",
+  g.number_of_players = yield from ask(g,
+    "HOW MANY PLAYERS (2,3,4, ... ,12 CAN PLAY) ", in_range(2, 12))
+  n = yield from ask(g, "HOW MANY SHIPS PER PLAYER (MAX 12) ",
     lambda n: n > 0 and n * g.number_of_players <= 12)
   g.ships = make_objects(g, make_ship, n * g.number_of_players)
-  number_of_stars = ask("HOW MANY STAR SYSTEMS (FROM 4 TO 13 STARS) ",
-    in_range(4, 13))
-  g.stars = make_objects(g, make_star, number_of_stars)
-  length = ask("ENTER THE LENGTH OF GAME IN YEARS ", lambda n: n > 0)
-  g.end_year = g.year + length
-  g.max_weight = ask("WHAT'S THE MAX CARGOE TONNAGE(USUALLY 30) ",
+  yield from ask_stars(g)
+  length = yield from ask(g, "ENTER THE LENGTH OF GAME IN YEARS ",
+    lambda n: n > 0)
+  g.end_year = year_of(g.time) + length
+  g.max_weight = yield from ask(g, "WHAT'S THE MAX CARGOE TONNAGE(USUALLY 30) ",
     lambda n: n >= 25)
-  say("WHAT'S THE MINIMUM DISTANCE BETWEEN STARS")
-  g.max_distance = ask("(MIN SPACING 10, MAX 25, USUALLY 15) ",
-    in_range(10, 25))
-  g.number_of_rounds = ask("HOW MANY BIDS OR OFFERS(USUALLY 3) ",
+  yield from ask_spacing(g)
+  g.number_of_rounds = yield from ask(g, "HOW MANY BIDS OR OFFERS(USUALLY 3) ",
     lambda n: n > 0)
-  say("SET THE PROFIT MARGIN(1,2,3,4 OR 5)...THE HIGHER\n")
-  say("THE NUMBER, THE LOWER THE PROFIT % ... USUALLY SET TO 2\n")
-  g.margin = ask("...YOUR NUMBER ", in_range(1, 5)) * 18
+  say(g, "SET THE PROFIT MARGIN(1,2,3,4 OR 5)...THE HIGHER\n")
+  say(g, "THE NUMBER, THE LOWER THE PROFIT % ... USUALLY SET TO 2\n")
+  g.margin = (yield from ask(g, "...YOUR NUMBER ", in_range(1, 5))) * 18
 
 def distance(x1, y1, x2, y2):
   return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
 
+# PLACED STARS ARE KEPT IN A GRID OF max_distance CELLS, SO ONLY
+# THE 3 x 3 NEIGHBOURING CELLS HAVE TO BE TESTED FOR PROXIMITY
+
+# A STAR THAT FINDS NO ROOM IN MAX_TRIES TRIES PER max_distance CELL OF
+# THE BOARD IS GIVEN UP: THE OLD LOOP NEVER GAVE UP, SO A LAYOUT NEEDING
+# MORE TRIES THAN THAT NOW FAILS. THE DENSEST LAYOUTS SEEN, 13 STARS AT
+# 20 AND 25 LIGHT-YEARS, NEEDED AT MOST 7000 TRIES PER CELL
+
+MAX_TRIES = 20000
+
+def max_tries(g):
+  return int(MAX_TRIES * (g.size / g.max_distance) ** 2)
+
+def grid_cell(g, x, y):
+  return (int(math.floor(x / g.max_distance)),
+    int(math.floor(y / g.max_distance)))
+
+def grid_add(g, index):
+  star = g.stars[index]
+  g.grid.setdefault(grid_cell(g, star.x, star.y), []).append(index)
+
+def make_grid(g, n):
+  g.grid = {}
+  for i in range(n):
+    grid_add(g, i)
+
+def too_close(g, x, y):
+  cx, cy = grid_cell(g, x, y)
+  for i in range(cx - 1, cx + 2):
+    for j in range(cy - 1, cy + 2):
+      for s in g.grid.get((i, j), ()):
+        if distance(x, y, g.stars[s].x, g.stars[s].y) < g.max_distance:
+          return True
+  return False
+
 # *** <TEST STAR CO-ORDS>
 # FIRST CONVERT CO-ORDS TO NEXT HALF-BOARD
 # SECOND, TEST PROXIMITY
@@ -232,37 +373,110 @@ def good_coords(g, index, x, y):
   g.half += 1
   if g.half > 4:
     g.half = 1
-  for i in range(index):
-    if distance(x, y, g.stars[i].x, g.stars[i].y) < g.max_distance:
-      return False
+  if too_close(g, x, y):
+    return False
   g.stars[index].x = rint(x)
   g.stars[index].y = rint(y)
+  grid_add(g, index)
   return True
 
+def no_room(g, index):
+  return ValueError("NO ROOM FOR STAR #%d %d LIGHT-YEARS FROM THE OTHERS" % (
+    index, g.max_distance))
+
+# STAR-TO-STAR TABLES (DISTANCES, TRAVEL DAYS) ARE LISTS OF ROWS, EACH
+# ROW COMPUTED THE FIRST TIME IT IS READ: SETTING UP A GALAXY COSTS O(N)
+# AND A BIG ONE ONLY PAYS FOR THE STARS ITS SHIPS LEAVE FROM
+
+def distance_row(g, i, n):
+  star = g.stars[i]
+  return [distance(s.x, s.y, star.x, star.y) for s in g.stars[:n]]
+
+def days_row(g, i, n):
+  return [rint(d / g.ship_speed) for d in g.distances[i]]
+
+class Table(object):
+  __slots__ = ("g", "make_row", "rows")
+
+  def __init__(self, g, make_row, rows):
+    self.g = g
+    self.make_row = make_row
+    self.rows = rows
+
+  def __len__(self):
+    return len(self.rows)
+
+  def __getitem__(self, i):
+    row = self.rows[i]
+    if row is None:
+      row = self.rows[i] = self.make_row(self.g, i, len(self.rows))
+    return row
+
+  def __iter__(self):
+    for i in range(len(self.rows)):
+      yield self[i]
+
+  def add(self):
+    # rows already computed get the new star's column; read-only rows
+    # (shared by shared.py) are copied first
+    self.rows.append(None)
+    n = len(self.rows) - 1
+    new = None
+    for i in range(n):
+      row = self.rows[i]
+      if row is not None:
+        if new is None:
+          new = self[n]
+        if not isinstance(row, list):
+          row = self.rows[i] = list(row)
+        row.append(new[i])
+
+def add_distances(g, index):
+  g.stars[index].index = index
+  g.map_text = None
+  g.distances.add()
+  g.travel_days.add()
+
 def generate_coords(g, index, bounds):
-  while True:
-    x = (rnd() - 0.5) * bounds
-    y = rnd() * bounds / 2
+  for i in range(max_tries(g)):
+    x = (rnd(g) - 0.5) * bounds
+    y = rnd(g) * bounds / 2
     if good_coords(g, index, x, y):
       return
+  raise no_room(g, index)
 
 def add_star(g, index, level):
   if level == FRONTIER:
-    while True:
-      x = (rnd() - 0.5) * 100
-      y = 50 * rnd()
-      if abs(x) >= 25 or y >= 25:
-        if good_coords(g, index, x, y):
-          break
+    for i in range(max_tries(g)):
+      x = (rnd(g) - 0.5) * g.size
+      y = g.size / 2 * rnd(g)
+      far = abs(x) >= g.size / 4 or y >= g.size / 4
+      if far and good_coords(g, index, x, y):
+        break
+    else:
+      raise no_room(g, index)
   elif level == UNDERDEVELOPED:
-    generate_coords(g, index, 100)
+    generate_coords(g, index, g.size)
   elif level == DEVELOPED:
-    generate_coords(g, index, 50)
+    generate_coords(g, index, g.size / 2)
   g.stars[index].level = level
 
+# GALAXIES THAT HAVE OR MAY GROW MORE STARS THAN STAR_NAMES NAME STAR #N
+# AFTER N ITSELF, THREE SYLLABLES LONG: 70 ** 3 NAMES, NONE IN STAR_NAMES
+
+SYLLABLES = [c + v for c in "BDFGKLMNPRSTVZ" for v in "AEIOU"]
+
+def star_name(index):
+  n = len(SYLLABLES)
+  return (SYLLABLES[index // (n * n) % n] + SYLLABLES[index // n % n] +
+    SYLLABLES[index % n])
+
 def name_star(g, index):
+  if max(g.max_stars, len(g.stars)) > len(STAR_NAMES):
+    g.stars[index].name = star_name(index)
+    return
   while True:
-    name = STAR_NAMES[1 + rint(13 * rnd())]
+    name = STAR_NAMES[1 + rint(13 * rnd(g))]
     found = False
     for i in range(1, len(g.stars)):
       if name == g.stars[i].name:
@@ -274,6 +488,7 @@ def name_star(g, index):
 
 def make_stars(g):
   g.half = 1
+  make_grid(g, 1)
   add_star(g, 1, FRONTIER)
   add_star(g, 2, FRONTIER)
   add_star(g, 3, UNDERDEVELOPED)
@@ -282,78 +497,120 @@ def make_stars(g):
     add_star(g, i, level)
   for i in range(1, len(g.stars)):
     name_star(g, i)
+  make_distances(g)
+
+def make_distances(g):
+  n = len(g.stars)
+  for i in range(n):
+    g.stars[i].index = i
+  g.map_text = None
+  g.distances = Table(g, distance_row, [None] * n)
+  g.travel_days = Table(g, days_row, [None] * n)
 
 def name_ships(g):
   ship_index = 0
-  say("\nCAPTAINS, NAME YOUR SHIPS\n")
+  say(g, "\nCAPTAINS, NAME YOUR SHIPS\n")
   for i in range(len(g.ships) // g.number_of_players):
     for p in range(g.number_of_players):
-      say("   CAPTAIN %d WHAT DO YOU CHRISTEN YOUR SHIP # %s\n" % (
-        p + 1, i + 1))
-      g.ships[ship_index].name = get_text()
+      say(g, "   CAPTAIN %d WHAT DO YOU CHRISTEN YOUR SHIP # %s\n",
+        p + 1, i + 1)
+      g.ships[ship_index].name = yield from get_text(g)
       g.ships[ship_index].player_index = p
       ship_index += 1
-    say("\n")
+    say(g, "\n")
+
+# THE STARS ASKED FOR MAY NOT FIT AT THE SPACING ASKED FOR: THE PLAYERS
+# ARE TOLD SO AND ASKED AGAIN FOR BOTH
+
+def lay_out_stars(g):
+  while True:
+    try:
+      make_stars(g)
+      return
+    except ValueError:
+      say(g, "\nTHERE IS NO ROOM FOR %d STARS %d LIGHT-YEARS APART -\n",
+        len(g.stars), g.max_distance)
+      say(g, "CHOOSE FEWER STARS OR A SMALLER SPACING\n")
+      yield from ask_stars(g)
+      yield from ask_spacing(g)
 
 def finish_setup(g):
-  make_stars(g)
-  name_ships(g)
+  yield from lay_out_stars(g)
+  yield from name_ships(g)
   g.accounts = make_objects(g, make_account, g.number_of_players)
+  count_assets(g)
 
 def setup(g):
-  say("INSTRUCTIONS (TYPE 'Y' OR 'N' PLEASE) ")
-  if get_text() == "Y":
-    say("%s\n" % (INTRO % g.max_weight))
-  say("HAVE ALL PLAYERS PLAYED BEFORE ")
-  if get_text() == "Y":
-    say("DO YOU WANT TO SET UP YOUR OWN GAME ")
-    if get_text() == "Y":
-      own_game(g)
-      finish_setup(g)
+  say(g, "INSTRUCTIONS (TYPE 'Y' OR 'N' PLEASE) ")
+  if (yield from get_text(g)) == "Y":
+    say(g, "%s\n", INTRO % g.max_weight)
+  say(g, "HAVE ALL PLAYERS PLAYED BEFORE ")
+  if (yield from get_text(g)) == "Y":
+    say(g, "DO YOU WANT TO SET UP YOUR OWN GAME ")
+    if (yield from get_text(g)) == "Y":
+      yield from own_game(g)
+      yield from finish_setup(g)
       return
-  g.number_of_players = ask("HOW MANY PLAYERS (2,3, OR 4 CAN PLAY) ",
-    in_range(2, 4))
+  g.number_of_players = yield from ask(g,
+    "HOW MANY PLAYERS (2,3, OR 4 CAN PLAY) ", in_range(2, 4))
   g.ships = make_objects(g, make_ship, 2 * g.number_of_players)
   g.stars = make_objects(g, make_star, 3 * g.number_of_players + 1)
-  g.end_year = g.year + 5
-  finish_setup(g)
+  g.end_year = year_of(g.time) + 5
+  yield from finish_setup(g)
 
-def star_map(g):
-  say("                      STAR MAP\n")
-  say("                    ************\n")
+# THE MAP IS DRAWN ONCE AND KEPT UNTIL A STAR JOINS THE GALAXY.  IT IS
+# 100 LIGHT-YEARS ACROSS, OR A MULTIPLE OF 100 WHEN STARS ARE FARTHER
+# OUT; EACH OF THE 31 ROWS GETS ITS STARS FROM A BUCKET
+
+def draw_map(g):
+  scale = 1
+  for star in g.stars:
+    scale = max(scale, int(math.ceil(max(abs(star.x), abs(star.y)) / 50)))
+  rows = {}
+  for star in g.stars[1:]:
+    row = int(math.floor(star.y * 3 / (10 * scale)))
+    rows.setdefault(row, []).append(star)
+  text = [
+    "                      STAR MAP\n",
+    "                    ************\n"
+  ]
   for y in range(15, -16, -1):
     line = list("                         1                             ")
     if y == 0:
       line = list("1----1----1----1----1----*SOL-1----1----1----1----1    ")
     elif y % 3 == 0:
       line[25] = "-"
-    y_hi = y * 10 / 3
-    y_lo = (y + 1) * 10 / 3
-    for s in range(1, len(g.stars)):
-      if g.stars[s].y < y_lo and g.stars[s].y >= y_hi:
-        x = rint(25 + g.stars[s].x / 2)
-        name = g.stars[s].name
-        line[x:x + len(name) + 1] = "*" + name
-    say("%s\n" % "".join(line))
-  say("\nTHE MAP IS 100 LIGHT-YEARS BY 100 LIGHT-YEARS,\n")
-  say("SO THE CROSS-LINES MARK 10 LIGHT-YEAR DISTANCES\n")
-
-def ga():
-  say("\n                    *** GENERAL ANNOUNCEMENT ***\n\n")
+    for star in rows.get(y, ()):
+      x = rint(25 + star.x / (2 * scale))
+      line[x:x + len(star.name) + 1] = "*" + star.name
+    text.append("%s\n" % "".join(line))
+  text.append("\nTHE MAP IS %d LIGHT-YEARS BY %d LIGHT-YEARS,\n" % (
+    100 * scale, 100 * scale))
+  text.append("SO THE CROSS-LINES MARK %d LIGHT-YEAR DISTANCES\n" % (
+    10 * scale))
+  return "".join(text)
+
+def star_map(g):
+  if g.map_text is None:
+    g.map_text = draw_map(g)
+  say(g, g.map_text)
+
+def ga(g):
+  say(g, "\n                    *** GENERAL ANNOUNCEMENT ***\n\n")
 
 # M AND C DETERMINE A STAR'S PRODUCTIVITY/MONTH
 #   PROD/MO. = S(7,J) * M(I,R1)  +  C(I,R1)
 #   WHERE J IS THE STAR ID #,I THE MERCHANDISE #,
 #   AND R1 IS THE DEVELOPMENT CLASS OF THE STAR
 
-def update_prices(g, star):
+def forecast(g, star, time):
   level = 0
   if star.level >= UNDERDEVELOPED:
     level += 1
   if star.level >= DEVELOPED:
     level += 1
-  months = 12 * (g.year - star.year) + (g.day - star.day) / 30
-  goods, prods, prices = star.goods, star.prods, star.prices
+  months = (time - star.time) / 30
+  goods, prods, prices = list(star.goods), [0] * 6, [0] * 6
   for i in range(6):
     k, b = ECONOMIC[i][level]
     prods[i] = k * star.level + b
@@ -366,8 +623,11 @@ def update_prices(g, star):
       prices[i] = 100 * rint(prices[i] / 100 + 0.5)
     else:
       prices[i] = 0
-  star.day = g.day
-  star.year = g.year
+  return goods, prods, prices
+
+def update_prices(g, star):
+  star.goods[:], star.prods[:], star.prices[:] = forecast(g, star, g.time)
+  star.time = g.time
 
 def text_level(g, star):
   level = int(star.level / 5)
@@ -381,28 +641,52 @@ def text_level(g, star):
     return "I"
 
 def update_account(g, account):
-  account.sum = account.sum * (1 + 0.05 * (
-    g.year - account.year + (g.day - account.day) / 360))
-  account.day = g.day
-  account.year = g.year
+  account.sum = account.sum * (1 + 0.05 * (g.time - account.time) / 360)
+  account.time = g.time
 
 def price_col(n):
   return "+" + str(n) if n > 0 else str(n)
 
+def update_stars(g):
+  for star in g.stars:
+    update_prices(g, star)
+    for j in range(6):
+      star.prices[j] = sgn(star.goods[j]) * star.prices[j]
+  for account in g.accounts:
+    update_account(g, account)
+
+# EACH PLAYER'S ACCOUNT ALSO KEEPS THE LEDGER OF $ ON SHIPS AND CARGOES,
+# UPDATED BY trade() AND withdraw(), SO STANDINGS COST NOTHING TO READ.
+# THE BANK FIGURE INCLUDES THE INTEREST DUE SINCE THE LAST update_account()
+
+def count_assets(g):
+  for account in g.accounts:
+    account.on_ships = 0
+    account.cargoes = 0
+  for ship in g.ships:
+    account = g.accounts[ship.player_index]
+    account.on_ships += ship.sum
+    for j in range(6):
+      account.cargoes += ship.goods[j] * PRICES[j]
+
+def standings(g, p):
+  account = g.accounts[p]
+  in_bank = rint(account.sum * (1 + 0.05 * (g.time - account.time) / 360))
+  return (account.on_ships, in_bank, account.cargoes,
+    account.on_ships + account.cargoes + in_bank)
+
 def report(g):
-  ga()
-  say("JAN  1, %d%s YEARLY REPORT # %d\n" % (
-    g.year, " " * 35, g.year - 2069))
-  if g.year <= 2070:
-    say("%s\n" % (REPORT % g.max_weight))
-  say("%sCURRENT PRICES\n\n" % (" " * 20))
-  say("NAME  CLASS %s\n" % GOODS_TITLE)
+  update_stars(g)
+  ga(g)
+  year = year_of(g.time)
+  say(g, "JAN  1, %d%s YEARLY REPORT # %d\n", year, " " * 35, year - 2069)
+  if year <= 2070:
+    say(g, "%s\n", REPORT % g.max_weight)
+  say(g, "%sCURRENT PRICES\n\n", " " * 20)
+  say(g, "NAME  CLASS %s\n", GOODS_TITLE)
   for i in range(len(g.stars)):
-    update_prices(g, g.stars[i])
     prices = g.stars[i].prices
-    for j in range(6):
-      prices[j] = sgn(g.stars[i].goods[j]) * prices[j]
-    say("%4s %5s  %5s %5s %5s %5s %5s %5s\n" % (
+    say(g, "%4s %5s  %5s %5s %5s %5s %5s %5s\n",
       g.stars[i].name,
       text_level(g, g.stars[i]),
       price_col(prices[0]),
@@ -411,111 +695,107 @@ def report(g):
       price_col(prices[3]),
       price_col(prices[4]),
       price_col(prices[5])
-    ))
+    )
     if i % 2 != 0:
-      say("\n")
-  say("\n('+' MEANS SELLING AND '-' MEANS BUYING)\n")
-  say("\n%sCAPTAINS\n\n" % (" " * 22))
-  say("NUMBER  $ ON SHIPS   $ IN BANK     CARGOES      TOTALS\n")
-  for account in g.accounts:
-    update_account(g, account)
+      say(g, "\n")
+  say(g, "\n('+' MEANS SELLING AND '-' MEANS BUYING)\n")
+  say(g, "\n%sCAPTAINS\n\n", " " * 22)
+  say(g, "NUMBER  $ ON SHIPS   $ IN BANK     CARGOES      TOTALS\n")
   for p in range(g.number_of_players):
-    say("\n")
-    on_ships = 0
-    cargoes = 0
-    for ship in g.ships:
-      if ship.player_index == p:
-        on_ships += ship.sum
-        for j in range(6):
-          cargoes += ship.goods[j] * PRICES[j]
-    in_bank = rint(g.accounts[p].sum)
-    totals = on_ships + cargoes + in_bank
-    say("  %2d    %10d  %10d  %10d  %10d\n" % (
+    say(g, "\n")
+    on_ships, in_bank, cargoes, totals = standings(g, p)
+    say(g, "  %2d    %10d  %10d  %10d  %10d\n",
       p + 1, on_ships, in_bank, cargoes, totals
-    ))
+    )
 
 def get_names(objects):
   return [o.name for o in objects]
 
-def ship_days(g, d):
-  g.ship.day += d
-  while g.ship.day > 360:
-    g.ship.day -= 360
-    g.ship.year += 1
+def voyage(g, from_star):
+  d = g.travel_days[from_star.index][g.ship.star.index]
+  w = 0
+  if rnd(g) <= g.ship_delay / 2:
+    w = 1 + rint(rnd(g) * 3)
+    d += 7 * w
+  g.ship.time += d
+  return w
+
+def lateness(g):
+  d = rint(rnd(g) * 3) + 1
+  if rnd(g) <= g.ship_delay / 2:
+    d = 0
+  g.ship.time += 7 * d
+  g.ship.status = d
 
 def travel(g, from_star):
-  d = rint(distance(
-    from_star.x, from_star.y, g.ship.star.x, g.ship.star.y) / g.ship_speed)
-  if rnd() <= g.ship_delay / 2:
-    w = 1 + rint(rnd() * 3)
+  w = voyage(g, from_star)
+  if w > 0:
     if w == 1:
-      say("LOCAL HOLIDAY SOON\n")
+      say(g, "LOCAL HOLIDAY SOON\n")
     elif w == 2:
-      say("CREWMEN DEMAND A VACATION\n")
+      say(g, "CREWMEN DEMAND A VACATION\n")
     elif w == 3:
-      say("SHIP DOES NOT PASS INSPECTION\n")
-    say(" - %d WEEK DELAY.\n" % w)
-    d += 7 * w
-  ship_days(g, d)
-  m = int((g.ship.day - 1) / 30)
-  say("THE ETA AT %s IS %s %d, %d\n" % (
-    g.ship.star.name, MONTHS[m], g.ship.day - 30 * m, g.ship.year))
-  d = rint(rnd() * 3) + 1
-  if rnd() <= g.ship_delay / 2:
-    d = 0
-  ship_days(g, 7 * d)
-  g.ship.status = d
+      say(g, "SHIP DOES NOT PASS INSPECTION\n")
+    say(g, " - %d WEEK DELAY.\n", w)
+  say(g, "THE ETA AT %s IS %s\n", g.ship.star.name, date(g.ship.time))
+  lateness(g)
+  schedule(g)
 
 def next_eta(g):
   targets = get_names(g.stars)
   while True:
-   ans = get_text()
+   ans = yield from get_text(g)
    if ans == "MAP":
      star_map(g)
    elif ans == "REPORT":
      report(g)
    elif ans == g.ship.star.name:
-     say("CHOOSE A DIFFERENT STAR SYSTEM TO VISIT")
+     say(g, "CHOOSE A DIFFERENT STAR SYSTEM TO VISIT")
    elif ans in targets:
      from_star = g.ship.star
      g.ship.star = g.stars[get_names(g.stars).index(ans)]
      travel(g, from_star)
      break
    else:
-     say("%s IS NOT A STAR NAME IN THIS GAME" % ans)
-   say("\n")
+     say(g, "%s IS NOT A STAR NAME IN THIS GAME", ans)
+   say(g, "\n")
+
+# SHIPS WAIT FOR LANDING IN A HEAP ORDERED BY ARRIVAL TIME,
+# SIMULTANEOUS ARRIVALS ARE ORDERED BY A RANDOM NUMBER DRAWN AT DEPARTURE
+
+def schedule(g):
+  g.voyages += 1
+  heapq.heappush(g.arrivals,
+    (g.ship.time, rnd(g), g.voyages, g.ship))
+
+def next_ship(g):
+  g.ship = heapq.heappop(g.arrivals)[3]
+
+def new_year(g):
+  year = year_of(g.ship.time)
+  if year_of(g.time) < year:
+    g.time = make_time(year)
+    return True
+  return False
 
 def landing(g):
-  d, y = g.ships[0].day, g.ships[0].year
-  ship_index = 0
-  for i in range(1, len(g.ships)):
-    if g.ships[i].day > d or g.ships[i].year > y:
-      pass
-    elif g.ships[i].day == d and rnd() > 0.5:
-      pass
-    else:
-      d, y = g.ships[i].day, g.ships[i].year
-      ship_index = i
-  g.ship = g.ships[ship_index]
-  if g.year < g.ship.year:
-    g.day = 1
-    g.year = g.ship.year
+  next_ship(g)
+  if new_year(g):
     report(g)
-    if g.year >= g.end_year:
+    if year_of(g.time) >= g.end_year:
       return False
-  g.day = g.ship.day
-  m = int((g.day - 1) / 30)
-  say("\n%s\n* %s %s, %d\n" % ("*" * 17, MONTHS[m], (g.day - 30 * m), g.year))
-  say("* %s HAS LANDED ON %s\n" % (g.ship.name, g.ship.star.name))
+  g.time = g.ship.time
+  say(g, "\n%s\n* %s\n", "*" * 17, date(g.time))
+  say(g, "* %s HAS LANDED ON %s\n", g.ship.name, g.ship.star.name)
   s = g.ship.status + 1
   if s == 2:
-    say("1 WEEK LATE - 'OUR COMPUTER MADE A MISTAKE'\n")
+    say(g, "1 WEEK LATE - 'OUR COMPUTER MADE A MISTAKE'\n")
   elif s == 3:
-    say("2 WEEKS LATE - 'WE GOT LOST.SORRY'\n")
+    say(g, "2 WEEKS LATE - 'WE GOT LOST.SORRY'\n")
   elif s == 4:
-    say("3 WEEKS LATE - PIRATES ATTACKED MIDVOYAGE\n")
-  say("\n$ ON BOARD %s   NET WT\n" % GOODS_TITLE)
-  say("%10d    %2d    %2d    %2d    %2d    %2d    %2d     %2d\n" % (
+    say(g, "3 WEEKS LATE - PIRATES ATTACKED MIDVOYAGE\n")
+  say(g, "\n$ ON BOARD %s   NET WT\n", GOODS_TITLE)
+  say(g, "%10d    %2d    %2d    %2d    %2d    %2d    %2d     %2d\n",
     g.ship.sum,
     g.ship.goods[0],
     g.ship.goods[1],
@@ -524,147 +804,219 @@ def landing(g):
     g.ship.goods[4],
     g.ship.goods[5],
     g.ship.weight
-  ))
+  )
   return True
 
-def price_window(g, index, units, current_round):
+def star_window(star, index, units, current_round):
   w = 0.5
-  star_units = g.ship.star.goods[index]
+  star_units = star.goods[index]
   if units < abs(star_units):
     w = units / (2 * abs(star_units))
   return w / (current_round + 1)
 
-def buy_rounds(g, index, units):
+def price_window(g, index, units, current_round):
+  return star_window(g.ship.star, index, units, current_round)
+
+def bid_range(g, index, units):
+  price = g.ship.star.prices[index] * units
+  return price / 10, price * 10
+
+def trade(g, index, units, price, r):
+  g.ship.goods[index] += units
+  if index < 4:
+    g.ship.weight += units
+  g.ship.star.goods[index] -= units
+  g.ship.sum -= price
+  account = g.accounts[g.ship.player_index]
+  account.on_ships -= price
+  account.cargoes += units * PRICES[index]
+  g.io.traded(g, index, units, price, r)
+
+# BID ANSWERS: True CLOSES THE DEAL, False ENDS THE HAGGLING,
+# None MEANS THE STAR MOVED ITS PRICE AND WAITS FOR THE NEXT ROUND
+
+def buy_offer(g, index, units):
+  return 100 * rint(0.009 * g.ship.star.prices[index] * units + 0.5)
+
+def buy_bid(g, index, units, r, price):
   star = g.ship.star
-  star_units = rint(star.goods[index])
+  if price <= star.prices[index] * units:
+    trade(g, index, -units, -price, r)
+    return True
+  elif price > (1 + price_window(g, index, units, r)
+    ) * star.prices[index] * units:
+    return False
+  star.prices[index] = 0.8 * star.prices[index] + 0.2 * price / units
+
+def sell_offer(g, index, units):
+  return 100 * rint(0.011 * g.ship.star.prices[index] * units + 0.5)
+
+def sell_bid(g, index, units, r, price):
+  star = g.ship.star
+  if price >= star.prices[index] * units:
+    return True
+  elif price < (1 - price_window(g, index, units, r)
+    ) * star.prices[index] * units:
+    return False
+  star.prices[index] = 0.8 * star.prices[index] + 0.2 * price / units
+
+# *** NEGOTIATION ORACLE ***
+# A BID INSIDE THE WINDOW MOVES THE STAR'S PRICE 20% OF THE WAY TOWARD
+# IT, SO THE BEST CAPTAIN BIDS AT THE EDGE OF THE WINDOW UNTIL THE FINAL
+# ROUND AND THEN AT THE STAR'S PRICE.  SELLING, EACH ROUND LEFT RAISES
+# THE PRICE BY 1 + 0.2 * W(R); BUYING, IT LOWERS IT BY 1 - 0.2 * W(R).
+# BOTH RETURN THE WHOLE-DOLLAR BIDS FROM current_round ON, THE LAST ONE
+# IS THE BEST PRICE THE STAR ACCEPTS
+
+def best_sale(g, star, index, units, current_round=0):
+  p = star.prices[index]
+  bids = []
+  for r in range(current_round, g.number_of_rounds - 1):
+    bid = int(math.floor(
+      (1 + star_window(star, index, units, r)) * p * units))
+    bids.append(bid)
+    p = 0.8 * p + 0.2 * bid / units
+  bids.append(int(math.floor(p * units)))
+  return bids
+
+def best_purchase(g, star, index, units, current_round=0):
+  p = star.prices[index]
+  bids = []
+  for r in range(current_round, g.number_of_rounds - 1):
+    bid = int(math.ceil(
+      (1 - star_window(star, index, units, r)) * p * units))
+    bids.append(bid)
+    p = 0.8 * p + 0.2 * bid / units
+  bids.append(int(math.ceil(p * units)))
+  return bids
+
+def can_borrow(g, price):
+  return (g.ship.star.level >= DEVELOPED and
+    g.ship.sum + g.accounts[g.ship.player_index].sum >= price)
+
+def buy_rounds(g, index, units):
+  star_units = rint(g.ship.star.goods[index])
   if units > 2 * -star_units:
     units = 2 * -star_units
-    say("     WE'LL BID ON %d UNITS.\n" % units)
+    say(g, "     WE'LL BID ON %d UNITS.\n", units)
   for r in range(g.number_of_rounds):
     if r != max(g.number_of_rounds - 1, 2):
-      say("     WE OFFER ")
+      say(g, "     WE OFFER ")
     else:
-      say("     OUR FINAL OFFER:")
-    say(100 * rint(0.009 * star.prices[index] * units + 0.5))
-    price = ask(" WHAT DO YOU BID ", in_range(
-      star.prices[index] * units / 10,
-      star.prices[index] * units * 10
-    ))
-    if price <= star.prices[index] * units:
-      say("     WE'LL BUY!\n")
-      g.ship.goods[index] -= units
-      if index < 4:
-        g.ship.weight -= units
-      g.ship.sum += price
-      star.goods[index] += units
+      say(g, "     OUR FINAL OFFER:")
+    say(g, buy_offer(g, index, units))
+    price = yield from ask(g, " WHAT DO YOU BID ",
+      in_range(*bid_range(g, index, units)))
+    answer = buy_bid(g, index, units, r, price)
+    if answer:
+      say(g, "     WE'LL BUY!\n")
       return
-    elif price > (1 + price_window(g, index, units, r)
-      ) * star.prices[index] * units:
+    elif answer is False:
       break
-    else:
-      star.prices[index] = 0.8 * star.prices[index] + 0.2 * price / units
-  say("     WE'LL PASS THIS ONE\n")
+  say(g, "     WE'LL PASS THIS ONE\n")
+
+def star_buys(g, index):
+  return rint(g.ship.star.goods[index]) < 0 and g.ship.goods[index] > 0
 
 def buy(g):
-  say("\nWE ARE BUYING:\n")
+  say(g, "\nWE ARE BUYING:\n")
   for i in range(6):
     star_units = rint(g.ship.star.goods[i])
-    if star_units < 0 and g.ship.goods[i] > 0:
-      say("     %s WE NEED %d UNITS.\n" % (GOODS_NAMES[i], -star_units))
+    if star_buys(g, i):
+      say(g, "     %s WE NEED %d UNITS.\n", GOODS_NAMES[i], -star_units)
       while True:
-        units = ask("HOW MANY ARE YOU SELLING ", lambda n: n >= 0)
+        units = yield from ask(g, "HOW MANY ARE YOU SELLING ", lambda n: n >= 0)
         if units == 0:
           break
         elif units <= g.ship.goods[i]:
-          buy_rounds(g, i, units)
+          yield from buy_rounds(g, i, units)
           break
         else:
-          say("     YOU ONLY HAVE %d" % g.ship.goods[i])
-          say(" UNITS IN YOUR HOLD\n     ")
+          say(g, "     YOU ONLY HAVE %d", g.ship.goods[i])
+          say(g, " UNITS IN YOUR HOLD\n     ")
 
-def sold(g, index, units, price):
-  say("     SOLD!\n")
-  g.ship.goods[index] += units
-  if index < 4:
-    g.ship.weight += units
-  g.ship.star.goods[index] -= units
-  g.ship.sum -= price
+def sold(g, index, units, price, r):
+  say(g, "     SOLD!\n")
+  trade(g, index, units, price, r)
 
 def sell_rounds(g, index, units):
-  star = g.ship.star
   for r in range(g.number_of_rounds):
     if r != max(g.number_of_rounds - 1, 2):
-      say("     WE WANT ABOUT ")
+      say(g, "     WE WANT ABOUT ")
     else:
-      say("     OUR FINAL OFFER:")
-    say(100 * rint(0.011 * star.prices[index] * units + 0.5))
-    price = ask(" YOUR OFFER ", in_range(
-      star.prices[index] * units / 10,
-      star.prices[index] * units * 10
-    ))
-    if price >= star.prices[index] * units:
+      say(g, "     OUR FINAL OFFER:")
+    say(g, sell_offer(g, index, units))
+    price = yield from ask(g, " YOUR OFFER ",
+      in_range(*bid_range(g, index, units)))
+    answer = sell_bid(g, index, units, r, price)
+    if answer:
       if price <= g.ship.sum:
-        sold(g, index, units, price)
+        sold(g, index, units, price, r)
         return
       else:
-        say("     YOU BID $ %d BUT YOU HAVE ONLY $ %d" % (price, g.ship.sum))
-        p = g.ship.player_index
-        if star.level >= DEVELOPED and g.ship.sum + g.accounts[p].sum >= price:
-          say("     ")
-          bank_call(g)
+        say(g, "     YOU BID $ %d BUT YOU HAVE ONLY $ %d", price, g.ship.sum)
+        if can_borrow(g, price):
+          say(g, "     ")
+          yield from bank_call(g)
           if price <= g.ship.sum:
-            sold(g, index, units, price)
+            sold(g, index, units, price, r)
             return
         break
-    elif price < (1 - price_window(g, index, units, r)
-      ) * star.prices[index] * units:
+    elif answer is False:
       break
-    star.prices[index] = 0.8 * star.prices[index] + 0.2 * price / units
-  say("     THAT'S TOO LOW\n")
+  say(g, "     THAT'S TOO LOW\n")
+
+def star_sells(g, index):
+  star = g.ship.star
+  if star.prods[index] <= 0 or star.goods[index] < 1:
+    return False
+  return index > 3 or g.ship.weight < g.max_weight
 
 def sell(g):
-  say("\nWE ARE SELLING:\n")
+  say(g, "\nWE ARE SELLING:\n")
   for i in range(6):
     star_units = rint(g.ship.star.goods[i])
-    if g.ship.star.prods[i] <= 0 or g.ship.star.goods[i] < 1:
-      pass
-    elif i <= 3 and g.ship.weight >= g.max_weight:
-      pass
-    else:
-      say("     %s UP TO %d UNITS." % (GOODS_NAMES[i], star_units))
+    if star_sells(g, i):
+      say(g, "     %s UP TO %d UNITS.", GOODS_NAMES[i], star_units)
       while True:
-        units = ask("HOW MANY ARE YOU BUYING ", in_range(0, star_units))
+        units = yield from ask(g, "HOW MANY ARE YOU BUYING ",
+          in_range(0, star_units))
         if units == 0:
           break
         elif i > 3 or units + g.ship.weight <= g.max_weight:
-          sell_rounds(g, i, units)
+          yield from sell_rounds(g, i, units)
           break
         else:
-          say("     YOU HAVE %d TONS ABOARD, SO %d" % (g.ship.weight, units))
-          say(" TONS PUTS YOU OVER\n")
-          say("     THE %d TON LIMIT.\n" % g.max_weight)
-          say("     ")
+          say(g, "     YOU HAVE %d TONS ABOARD, SO %d", g.ship.weight, units)
+          say(g, " TONS PUTS YOU OVER\n")
+          say(g, "     THE %d TON LIMIT.\n", g.max_weight)
+          say(g, "     ")
+
+def withdraw(g, x):
+  account = g.accounts[g.ship.player_index]
+  account.sum -= x
+  account.on_ships += x
+  g.ship.sum += x
+
+def deposit(g, x):
+  withdraw(g, -x)
 
 def bank_call(g):
-  say("DO YOU WISH TO VISIT THE LOCAL BANK ")
-  if get_text() != "Y":
+  say(g, "DO YOU WISH TO VISIT THE LOCAL BANK ")
+  if (yield from get_text(g)) != "Y":
     return
   p = g.ship.player_index
   account = g.accounts[p]
   update_account(g, account)
-  say("     YOU HAVE $ %d IN THE BANK\n" % account.sum)
-  say("     AND $ %d ON YOUR SHIP\n" % g.ship.sum)
+  say(g, "     YOU HAVE $ %d IN THE BANK\n", account.sum)
+  say(g, "     AND $ %d ON YOUR SHIP\n", g.ship.sum)
   if account.sum >= 0:
-    x = ask("     HOW MUCH DO YOU WISH TO WITHDRAW ",
-      in_range(0, account.sum))
-    account.sum -= x
-    g.ship.sum += x
-  x = ask("     HOW MUCH DO YOU WISH TO DEPOSIT ",
-    in_range(0, g.ship.sum))
-  g.ship.sum -= x
-  account.sum += x
+    withdraw(g, (yield from ask(g,
+      "     HOW MUCH DO YOU WISH TO WITHDRAW ", in_range(0, account.sum))))
+  deposit(g, (yield from ask(g,
+    "     HOW MUCH DO YOU WISH TO DEPOSIT ", in_range(0, g.ship.sum))))
 
-def update_class(g, star):
+def develop(g, star):
   n = 0
   for i in range(6):
     if star.goods[i] >= 0:
@@ -676,58 +1028,415 @@ def update_class(g, star):
   if n > 1:
     return False
   star.level += g.level_inc
+  return True
+
+def update_class(g, star):
+  if not develop(g, star):
+    return False
   if star.level in (UNDERDEVELOPED, DEVELOPED, COSMOPOLITAN):
-    ga()
-    say("STAR SYSTEM %s IS NOW A CLASS %s SYSTEM\n" % (
-      star.name, text_level(g, star)))
+    ga(g)
+    say(g, "STAR SYSTEM %s IS NOW A CLASS %s SYSTEM\n",
+      star.name, text_level(g, star))
   return True
 
-def new_star(g):
-  if len(g.stars) == 15:
-    return
+def discover_star(g):
+  if len(g.stars) >= g.max_stars:
+    return False
   n = 0
   for star in g.stars:
     n += star.level
   if n / len(g.stars) < 10:
-    return
+    return False
   g.stars.append(make_star(g))
-  add_star(g, len(g.stars) - 1, FRONTIER)
+  try:
+    add_star(g, len(g.stars) - 1, FRONTIER)
+  except ValueError:
+    # a full galaxy is an error at setup, in play it just finds nothing
+    g.stars.pop()
+    return False
   name_star(g, len(g.stars) - 1)
-  g.stars[-1].day = g.day
-  g.stars[-1].year = g.year
-  ga()
-  say("A NEW STAR SYSTEM HAS BEEN DISCOVERED!  IT IS A CLASS IV\n")
-  say("AND ITS NAME IS %s\n\n" % g.stars[-1].name)
+  add_distances(g, len(g.stars) - 1)
+  g.stars[-1].time = g.time
+  return True
+
+def new_star(g):
+  if not discover_star(g):
+    return
+  ga(g)
+  say(g, "A NEW STAR SYSTEM HAS BEEN DISCOVERED!  IT IS A CLASS IV\n")
+  say(g, "AND ITS NAME IS %s\n\n", g.stars[-1].name)
   star_map(g)
 
-def start(g):
+def start(g, path=None):
   star_map(g)
   report(g)
-  say(ADVICE)
+  say(g, ADVICE)
   for ship in g.ships:
-    say("\nPLAYER %d, WHICH STAR WILL %s TRAVEL TO " % (
-      ship.player_index + 1, ship.name))
+    say(g, "\nPLAYER %d, WHICH STAR WILL %s TRAVEL TO ",
+      ship.player_index + 1, ship.name)
     g.ship = ship
     g.ship.star = g.stars[0]
-    next_eta(g)
+    yield from next_eta(g)
+  yield from play(g, path)
+
+def new_game(g, path=None):
+  yield from setup(g)
+  yield from start(g, path)
+
+def turn_over(g, path):
+  if path is not None:
+    save_game(g, path)
+  g.io.end_turn(g)
+
+def play(g, path=None):
+  turn_over(g, path)
   while landing(g):
     star = g.ship.star
     account = g.accounts[g.ship.player_index]
     update_prices(g, star)
-    buy(g)
-    sell(g)
+    g.io.landed(g)
+    yield from buy(g)
+    yield from sell(g)
     if star.level >= DEVELOPED and g.ship.sum + account.sum != 0:
-      bank_call(g)
-    say("\nWHAT IS YOUR NEXT PORT OF CALL ")
-    next_eta(g)
+      yield from bank_call(g)
+    say(g, "\nWHAT IS YOUR NEXT PORT OF CALL ")
+    yield from next_eta(g)
     if update_class(g, star):
       new_star(g)
-  ga()
-  say("GAME OVER\n")
+    turn_over(g, path)
+  g.io.end_turn(g)
+  ga(g)
+  say(g, "GAME OVER\n")
+  g.io.flush()
+  if path is not None and os.path.exists(path):
+    os.remove(path)
 
-def main():
+# *** HEADLESS ENGINE ***
+# THE SAME RULES AS start(), BUT EVERY DECISION COMES FROM A STRATEGY
+# OBJECT (ONE PER PLAYER) AND NOTHING IS PRINTED
+
+class Strategy:
+  # the default captain takes every offer and tours the stars in order
+
+  def destination(self, g):
+    return (g.ship.star.index + 1) % len(g.stars)
+
+  def sell_units(self, g, index, wanted):
+    return min(wanted, g.ship.goods[index])
+
+  def sale_price(self, g, index, units, r, offer):
+    return offer
+
+  def buy_units(self, g, index, available):
+    price = sell_offer(g, index, 1)
+    return min(available, int(g.ship.sum / price) if price > 0 else 0)
+
+  def purchase_price(self, g, index, units, r, offer):
+    return offer
+
+  def visit_bank(self, g, need):
+    return need > 0
+
+  def withdraw(self, g, account, need):
+    return need - g.ship.sum
+
+  def deposit(self, g, account):
+    return 0
+
+clamp = lambda lo, hi, n: max(lo, min(hi, n))
+
+# place_stars LAYS OUT THE GALAXY, galaxies.Library CAN LOAD IT INSTEAD.
+# A GALAXY SET UP WITH MORE THAN max_stars STARS RAISES max_stars TO THEM
+
+def auto_setup(g, number_of_players=2, ships_per_player=2,
+  number_of_stars=None, length=5, place_stars=make_stars):
+  if number_of_stars is None:
+    number_of_stars = 3 * number_of_players + 1
+  # SOL and the three stars make_stars() always places
+  if not isinstance(number_of_stars, int) or number_of_stars < 4:
+    raise ValueError("A GALAXY HAS 4 STARS OR MORE, NOT %s" %
+      number_of_stars)
+  g.number_of_players = number_of_players
+  g.ships = make_objects(g, make_ship, ships_per_player * number_of_players)
+  for i, ship in enumerate(g.ships):
+    ship.player_index = i % number_of_players
+    ship.name = "SHIP %d" % (i + 1)
+  g.stars = make_objects(g, make_star, number_of_stars)
+  g.max_stars = max(g.max_stars, number_of_stars)
+  g.end_year = year_of(g.time) + length
+  place_stars(g)
+  g.accounts = make_objects(g, make_account, g.number_of_players)
+  count_assets(g)
+
+def auto_eta(g, strategy):
+  index = strategy.destination(g)
+  from_star = g.ship.star
+  if g.stars[index] is from_star:
+    raise ValueError("%s IS ALREADY AT %s" % (g.ship.name, from_star.name))
+  g.ship.star = g.stars[index]
+  voyage(g, from_star)
+  lateness(g)
+  schedule(g)
+
+def auto_bank(g, strategy, need=0):
+  if not strategy.visit_bank(g, need):
+    return
+  account = g.accounts[g.ship.player_index]
+  update_account(g, account)
+  if account.sum >= 0:
+    withdraw(g, clamp(0, account.sum, strategy.withdraw(g, account, need)))
+  deposit(g, clamp(0, g.ship.sum, strategy.deposit(g, account)))
+
+def auto_buy(g, strategy):
+  for i in range(6):
+    if not star_buys(g, i):
+      continue
+    wanted = -rint(g.ship.star.goods[i])
+    units = clamp(0, g.ship.goods[i], strategy.sell_units(g, i, wanted))
+    units = min(units, 2 * wanted)
+    for r in range(g.number_of_rounds if units > 0 else 0):
+      lo, hi = bid_range(g, i, units)
+      price = clamp(lo, hi,
+        strategy.sale_price(g, i, units, r, buy_offer(g, i, units)))
+      if buy_bid(g, i, units, r, price) is not None:
+        break
+
+def auto_sell(g, strategy):
+  for i in range(6):
+    if not star_sells(g, i):
+      continue
+    units = clamp(0, rint(g.ship.star.goods[i]),
+      strategy.buy_units(g, i, rint(g.ship.star.goods[i])))
+    if i <= 3:
+      units = min(units, g.max_weight - g.ship.weight)
+    for r in range(g.number_of_rounds if units > 0 else 0):
+      lo, hi = bid_range(g, i, units)
+      price = clamp(lo, hi,
+        strategy.purchase_price(g, i, units, r, sell_offer(g, i, units)))
+      answer = sell_bid(g, i, units, r, price)
+      if answer and price > g.ship.sum and can_borrow(g, price):
+        auto_bank(g, strategy, price)
+      if answer and price <= g.ship.sum:
+        trade(g, i, units, price, r)
+      if answer is not None:
+        break
+
+def auto_start(g, strategies):
+  update_stars(g)
+  for ship in g.ships:
+    g.ship = ship
+    g.ship.star = g.stars[0]
+    auto_eta(g, strategies[ship.player_index])
+
+# LANDS THE NEXT SHIP AND UPDATES ITS STAR, FALSE WHEN THE GAME IS OVER
+
+def auto_landing(g):
+  next_ship(g)
+  if new_year(g):
+    update_stars(g)
+    if year_of(g.time) >= g.end_year:
+      return False
+  g.time = g.ship.time
+  update_prices(g, g.ship.star)
+  g.io.landed(g)
+  return True
+
+def auto_turn(g, strategy):
+  star = g.ship.star
+  account = g.accounts[g.ship.player_index]
+  auto_buy(g, strategy)
+  auto_sell(g, strategy)
+  if star.level >= DEVELOPED and g.ship.sum + account.sum != 0:
+    auto_bank(g, strategy)
+  auto_eta(g, strategy)
+  if develop(g, star):
+    discover_star(g)
+
+def simulate(g, strategies):
+  auto_start(g, strategies)
+  while auto_landing(g):
+    auto_turn(g, strategies[g.ship.player_index])
+  return g
+
+# *** FAST FORWARD ***
+# AGES THE GALAXY BY days WITH NO SHIPS MOVING: AT THE END OF EVERY MONTH
+# EACH STAR IS UPDATED AND CHECKED FOR A CLASS CHANGE AS IF A SHIP HAD
+# LEFT IT, AND EVERY CLASS CHANGE MAY DISCOVER A STAR.  WITHOUT TRADE A
+# STAR'S GOODS ONLY MOVE AWAY FROM ZERO, SO ONCE develop() FAILS IT FAILS
+# UNTIL THE STAR'S CLASS CHANGES: SUCH A STAR IS NOT CHECKED AGAIN AND
+# THE COST FOLLOWS THE NUMBER OF CLASS CHANGES, NOT THE NUMBER OF DAYS.
+# SHIPS IN FLIGHT ARRIVE days LATER.  WITH every, ALSO RETURNS THE PRICES
+# OF ALL STARS EVERY every DAYS AS [(TIME, [PRICES PER STAR])]
+
+def price_history(g, time):
+  return (time, [forecast(g, star, time)[2] for star in g.stars])
+
+def fast_forward(g, days, every=None):
+  start = g.time
+  end = start + days
+  samples = list(range(start + every, end + 1, every)) if every else []
+  history = []
+  active = list(g.stars)
+  t = start
+  while active and t + 30 <= end:
+    t += 30
+    while samples and samples[0] < t:
+      history.append(price_history(g, samples.pop(0)))
+    g.time = t
+    developed, discovered = [], []
+    for star in active:
+      update_prices(g, star)
+      if develop(g, star):
+        developed.append(star)
+        if discover_star(g):
+          discovered.append(g.stars[-1])
+    active = developed + discovered
+  g.time = end
+  for time in samples:
+    history.append(price_history(g, time))
+  for star in g.stars:
+    update_prices(g, star)
+  for ship in g.ships:
+    ship.time += days
+  g.arrivals = [(t + days, tie, voyage, ship)
+    for t, tie, voyage, ship in g.arrivals]
+  return history
+
+# *** SAVED GAMES ***
+# LITTLE-ENDIAN RECORDS: HEADER, GAME, RNG STATE, STARS, SHIPS, ACCOUNTS,
+# ARRIVALS.  NAMES FOLLOW THEIR RECORD AS A LENGTH BYTE AND ASCII TEXT.
+# THE STAR GRID AND DISTANCE TABLES ARE REBUILT ON LOADING (WITHOUT
+# tables, THE CALLER SUPPLIES THE DISTANCE TABLES)
+
+SAVE_MAGIC = b"STRD"
+SAVE_VERSION = 2
+
+SAVE_HEADER = struct.Struct("<4sH")
+SAVE_GAME = struct.Struct("<6d8q5i")
+SAVE_RNG = struct.Struct("<i625IBd")
+SAVE_STAR = struct.Struct("<2dqd18d")
+SAVE_SHIP = struct.Struct("<8dq3i")
+SAVE_ACCOUNT = struct.Struct("<dq")
+SAVE_ARRIVAL = struct.Struct("<qdqi")
+
+# WHOLE NUMBERS COME BACK AS INTS, EXCEPT -0.0: A STAR'S GOODS OFTEN
+# REACH IT, AND IT MUST SAVE AGAIN TO THE SAME BYTES
+
+def num(x):
+  return int(x) if x.is_integer() and math.copysign(1, x) > 0 else x
+
+def pack_name(name):
+  name = name.encode("ascii")
+  return struct.pack("<B", len(name)) + name
+
+def game_bytes(g):
+  ships = dict((id(ship), i) for i, ship in enumerate(g.ships))
+  version, state, gauss = g.rng.getstate()
+  chunks = [
+    SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION),
+    SAVE_GAME.pack(g.ship_speed, g.max_distance, g.ship_delay, g.level_inc,
+      g.margin, g.size, g.number_of_rounds, g.max_weight, g.time, g.end_year,
+      g.number_of_players, g.half, g.voyages, g.max_stars,
+      ships.get(id(g.ship), -1),
+      len(g.stars), len(g.ships), len(g.accounts), len(g.arrivals)),
+    SAVE_RNG.pack(version, *(state + (gauss is not None, gauss or 0)))
+  ]
+  for star in g.stars:
+    chunks.append(SAVE_STAR.pack(*[star.x, star.y, star.time, star.level] +
+      star.goods + star.prods + star.prices))
+    chunks.append(pack_name(star.name))
+  for ship in g.ships:
+    chunks.append(SAVE_SHIP.pack(*ship.goods + [ship.weight, ship.sum,
+      ship.time, -1 if ship.star is None else ship.star.index,
+      ship.status, ship.player_index]))
+    chunks.append(pack_name(ship.name))
+  for account in g.accounts:
+    chunks.append(SAVE_ACCOUNT.pack(account.sum, account.time))
+  for t, tie, voyage, ship in g.arrivals:
+    chunks.append(SAVE_ARRIVAL.pack(t, tie, voyage, ships[id(ship)]))
+  return b"".join(chunks)
+
+def save_game(g, path):
+  temp = path + ".tmp"
+  with open(temp, "wb") as f:
+    f.write(game_bytes(g))
+  os.replace(temp, path)
+
+def game_from_bytes(data, tables=True):
+  data = memoryview(data)
+  pos = [0]
+
+  def read(record):
+    values = record.unpack_from(data, pos[0])
+    pos[0] += record.size
+    return values
+
+  def read_name():
+    n = data[pos[0]]
+    pos[0] += 1 + n
+    return bytes(data[pos[0] - n:pos[0]]).decode("ascii")
+
+  magic, version = read(SAVE_HEADER)
+  if magic != SAVE_MAGIC or version != SAVE_VERSION:
+    raise ValueError("NOT A SAVED STAR TRADER GAME (VERSION %d)" %
+      SAVE_VERSION)
   g = make_game()
-  setup(g)
-  start(g)
+  (g.ship_speed, max_distance, g.ship_delay, g.level_inc, margin, size,
+    g.number_of_rounds, g.max_weight, g.time, g.end_year,
+    g.number_of_players, g.half, g.voyages, g.max_stars, ship_index,
+    n_stars, n_ships, n_accounts, n_arrivals) = read(SAVE_GAME)
+  g.max_distance, g.margin, g.size = num(max_distance), num(margin), num(size)
+  rng = read(SAVE_RNG)
+  g.rng.setstate((rng[0], rng[1:626], rng[627] if rng[626] else None))
+  g.stars = make_objects(g, make_star, n_stars)
+  for i, star in enumerate(g.stars):
+    values = read(SAVE_STAR)
+    star.index = i
+    star.x, star.y, star.time = num(values[0]), num(values[1]), values[2]
+    star.level = num(values[3])
+    star.goods = [num(x) for x in values[4:10]]
+    star.prods = [num(x) for x in values[10:16]]
+    star.prices = [num(x) for x in values[16:22]]
+    star.name = read_name()
+  g.ships = make_objects(g, make_ship, n_ships)
+  for ship in g.ships:
+    values = read(SAVE_SHIP)
+    ship.goods = [num(x) for x in values[:6]]
+    ship.weight, ship.sum = num(values[6]), num(values[7])
+    ship.time = values[8]
+    ship.star = g.stars[values[9]] if values[9] >= 0 else None
+    ship.status, ship.player_index = values[10], values[11]
+    ship.name = read_name()
+  g.accounts = make_objects(g, make_account, n_accounts)
+  for account in g.accounts:
+    money, account.time = read(SAVE_ACCOUNT)
+    account.sum = num(money)
+  for i in range(n_arrivals):
+    t, tie, voyage, ship = read(SAVE_ARRIVAL)
+    g.arrivals.append((t, tie, voyage, g.ships[ship]))
+  g.ship = g.ships[ship_index] if ship_index >= 0 else None
+  count_assets(g)
+  make_grid(g, len(g.stars))
+  if tables:
+    make_distances(g)
+  return g
+
+def load_game(path):
+  with open(path, "rb") as f:
+    return game_from_bytes(f.read())
+
+def main():
+  path = sys.argv[1] if len(sys.argv) > 1 else None
+  resume = path is not None and os.path.exists(path)
+  g = load_game(path) if resume else make_game()
+  try:
+    if resume:
+      say(g, "GAME RESTORED FROM %s\n", path)
+      run(g, play(g, path))
+    else:
+      run(g, new_game(g, path))
+  finally:
+    g.io.flush()
 
-main()
+if __name__ == "__main__":
+  main()